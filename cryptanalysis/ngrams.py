@@ -0,0 +1,199 @@
+# Compact binary n-gram tables for the cryptanalysis of historical ciphers
+#
+# File format (little-endian):
+#   magic b'NGRM', uint32 N, then for n = 1..N a table of 26^n float32
+#   log10-probabilities, indexed by the n-gram read as a base-26 number
+#   (e.g. "th" -> 19*26 + 7)
+
+import os
+import sys
+import math
+import mmap
+import struct
+import multiprocessing
+from array import array
+from collections import Counter
+
+MAGIC = b'NGRM'
+HEADER = struct.Struct('<4sI')
+
+
+# reads a frequency table in the format of monograms_en.txt ("ngram freq" per line)
+def read_freqs(filename):
+  freqs = {}
+  with open(filename, "r") as f:
+    for s in f:
+      if s.strip():
+        (g, p) = s.split()
+        freqs[g] = float(p)
+  return freqs
+
+
+# completes the known n-gram frequencies into a distribution over all 26^n
+# n-grams: unknown n-grams share the leftover mass in proportion to the
+# probability of their (n-1)-gram prefix times the frequency of their last letter
+def complete(known, prev, mono):
+  n = len(next(iter(known)))
+  prior = [prev[i // 26] * mono[i % 26] for i in range(26 ** n)]
+  idx = {g: index_of(g) for g in known}
+  rest = 1.0 - sum(known.values())
+  rest_prior = sum(prior) - sum(prior[i] for i in idx.values())
+  p = [q * rest / rest_prior for q in prior]
+  for (g, i) in idx.items():
+    p[i] = known[g]
+  return p
+
+
+def index_of(g):
+  i = 0
+  for c in g:
+    i = i * 26 + ord(c) - ord('a')
+  return i
+
+
+# writes probability tables (lists of 26^n floats, n = 1..N) as log10 tables
+def write_tables(filename, tables):
+  with open(filename, "wb") as f:
+    f.write(HEADER.pack(MAGIC, len(tables)))
+    for p in tables:
+      t = array('f', (math.log10(max(q, 1e-12)) for q in p))
+      if sys.byteorder == 'big':
+        t.byteswap()
+      f.write(t.tobytes())
+
+
+# memory-maps a table file: returns a list of N float32 views, where
+# tables[n-1][i] is the log10-probability of the n-gram with index i
+def load_tables(filename):
+  with open(filename, "rb") as f:
+    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+  (magic, N) = HEADER.unpack_from(mm)
+  assert magic == MAGIC, filename + " is not an n-gram table file"
+  tables = []
+  off = HEADER.size
+  for n in range(1, N + 1):
+    size = 4 * 26 ** n
+    if sys.byteorder == 'big':
+      t = array('f', mm[off:off + size])
+      t.byteswap()
+    else:
+      t = memoryview(mm)[off:off + size].cast('f')
+    tables.append(t)
+    off = off + size
+  return tables
+
+
+# Counting n-grams in a corpus.
+# The corpus is normalized as the plaintexts in shift.py's main: the
+# punctuation in PUNCTUATION is removed (so n-grams span across words) and
+# letters are lowercased; any other byte (newline, digit, non-ASCII...)
+# breaks the n-grams. Chunks are split at fixed offsets (never inside a
+# UTF-8 character); each chunk counts the n-grams starting in it, reading
+# the few letters after its end that they need
+PUNCTUATION = b" .,'-"
+APOSTROPHE = "’".encode()
+NORMALIZE = bytes(c + 32 if ord('A') <= c <= ord('Z') else c if ord('a') <= c <= ord('z') else ord('\n')
+                  for c in range(256))
+CHUNK_SIZE = 1 << 26
+
+def chunk_bounds(mm, size):
+  # splits mm in ranges of about size bytes, whatever the line lengths; a
+  # bound is moved past UTF-8 continuation bytes, so that no character
+  # (e.g. an apostrophe) is split between two chunks
+  bounds = []
+  lo = 0
+  while lo < len(mm):
+    hi = min(lo + size, len(mm))
+    while hi < len(mm) and 0x80 <= mm[hi] < 0xc0:
+      hi = hi + 1
+    bounds.append((lo, hi))
+    lo = hi
+  return bounds
+
+def normalize(data):
+  if APOSTROPHE in data:
+    data = data.replace(APOSTROPHE, b'')
+  return data.translate(NORMALIZE, PUNCTUATION)
+
+def following(mm, hi, k):
+  # the first k normalized bytes after position hi (fewer at the end)
+  window = 16
+  while True:
+    end = min(hi + window, len(mm))
+    while end < len(mm) and 0x80 <= mm[end] < 0xc0:
+      end = end + 1
+    tail = normalize(mm[hi:end])
+    if len(tail) >= k or end == len(mm):
+      return tail[:k]
+    window = 2 * window
+
+def count_chunk(filename, lo, hi, N):
+  # counts (n = 1..N) of the n-grams starting in a range of the corpus, as
+  # flat lists
+  with open(filename, "rb") as f:
+    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    text = normalize(mm[lo:hi])
+    m = len(text)
+    text = text + following(mm, hi, N - 1)
+    mm.close()
+  tables = []
+  for n in range(1, N + 1):
+    counts = [0] * 26 ** n
+    grams = text[:m + n - 1]
+    for (gram, c) in Counter(zip(*(grams[i:] for i in range(n)))).items():
+      if ord('\n') not in gram:
+        i = 0
+        for a in gram:
+          i = i * 26 + a - ord('a')
+        counts[i] = c
+    tables.append(counts)
+  return tables
+
+def count_corpus(filename, N=3, workers=None):
+  # n-gram counts of a corpus file, counted in parallel over its chunks
+  with open(filename, "rb") as f:
+    if os.fstat(f.fileno()).st_size == 0:
+      return [[0] * 26 ** n for n in range(1, N + 1)]
+    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    bounds = chunk_bounds(mm, CHUNK_SIZE)
+    mm.close()
+  tables = [[0] * 26 ** n for n in range(1, N + 1)]
+  with multiprocessing.Pool(workers) as pool:
+    for part in pool.starmap(count_chunk, [(filename, lo, hi, N) for (lo, hi) in bounds]):
+      for (t, counts) in zip(tables, part):
+        for i in range(len(t)):
+          t[i] = t[i] + counts[i]
+  return tables
+
+# probabilities from counts, with additive smoothing for unseen n-grams
+def probs_of_counts(counts, alpha=0.01):
+  total = sum(counts) + alpha * len(counts)
+  return [(c + alpha) / total for c in counts]
+
+
+def main(args):
+  if len(args) == 3 and args[0] == "-corpus":
+    tables = count_corpus(args[1])
+    print("Counted", sum(tables[0]), "letters of", args[1])
+    write_tables(args[2], [probs_of_counts(t) for t in tables])
+    print("Written", args[2])
+    return
+
+  if len(args) != 4:
+    print("""\
+Usage: python ngrams.py monograms bigrams trigrams outfile
+    builds the binary n-gram tables from frequency lists
+       python ngrams.py -corpus corpus outfile
+    builds the binary n-gram tables from a text corpus
+        """)
+    sys.exit(0)
+
+  m = read_freqs(args[0])
+  mono = [m[chr(c)] / sum(m.values()) for c in range(ord('a'), ord('z') + 1)]
+  bi = complete(read_freqs(args[1]), mono, mono)
+  tri = complete(read_freqs(args[2]), bi, mono)
+  write_tables(args[3], [mono, bi, tri])
+  print("Written", args[3])
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
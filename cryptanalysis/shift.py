@@ -1,6 +1,15 @@
 # Cryptanalysis of the shift cipher in ECB mode
 
+import os
 import sys
+import math
+import json
+import hashlib
+from collections import Counter, OrderedDict
+import ngrams
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import instrument
 
 # encrypts a string x with key k
 # note: we use chr, rather than Z26
@@ -13,13 +22,13 @@ def encrypt(x, k):
 			y = y + yi
 	return y
 
+# 26x26 decryption lookup: DEC[k] maps each ciphertext letter to its
+# plaintext letter under key k, for use with str.translate
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+DEC = {k: str.maketrans(LETTERS, LETTERS[-i:] + LETTERS[:-i]) for (i, k) in enumerate(LETTERS)}
+
 def decrypt(y, k):
-	x = ""
-	for yi in y:
-		base = ord('a')
-		xi = chr(base + ((ord(yi) - base) - (ord(k) - base)) % 26)
-		x = x + xi
-	return x
+	return y.translate(DEC[k])
 
 
 # constructs a dictionary with english letter frequencies
@@ -35,6 +44,10 @@ def freq_monograms():
 
 # computes a dictionary containing the indexes of mutual coincidence of x
 def mutualCoincidence(x):
+  with instrument.phase("mutualCoincidence"):
+    _mutualCoincidence(x)
+
+def _mutualCoincidence(x):
   freq_x = {}
   for c in range(ord('a'), ord('z') + 1):
     freq_x[chr(c)] = 0
@@ -53,21 +66,170 @@ def mutualCoincidence(x):
     M[gC] = M[gC] / len(x)
 
 
+# loads letter frequencies from a binary n-gram table file (see ngrams.py),
+# e.g. built from a corpus in another language
+def freq_tables(filename):
+  print("Letter frequencies from " + filename + ":")
+  mono = ngrams.load_tables(filename)[0]
+  for i in range(26):
+    freq_en[chr(ord('a') + i)] = 10 ** mono[i]
+  print(freq_en)
+
+
+# loads the bigram/trigram log-probability tables (memory-mapped) and the word
+# list of the same language (no word list: no word coverage bonus)
+def load_ngrams(filename="ngrams_en.bin", words="words_en.txt"):
+  global ngram_tables, words_en
+  ngram_tables = ngrams.load_tables(filename)
+  words_en = frozenset()
+  if words:
+    with open(words, "r") as f:
+      words_en = frozenset(w.strip() for w in f if len(w.strip()) >= 3)
+
+
+# scores all 26 candidate decryptions of y, returning the top (key, score)
+# pairs. The score is the average bigram and trigram log10-probability per
+# letter, plus WORD_WEIGHT times the fraction of the (first WORD_SPAN)
+# letters covered by dictionary words.
+# The n-gram part is computed from a single histogram of the ciphertext
+# n-grams rather than by decrypting and rescanning y for every key:
+# decrypting with key g shifts every letter by -g, so each distinct
+# ciphertext n-gram maps to a known n-gram of every candidate (this is
+# still a plain Python loop over the 26 keys and the distinct n-grams)
+def ngramRanking(y, top=3):
+  codes = [ord(c) - ord('a') for c in y]
+  score = [0.0] * 26
+  for n in [2, 3]:
+    table = ngram_tables[n - 1]
+    hist = Counter(zip(*(codes[i:] for i in range(n))))
+    total = sum(hist.values())
+    if total == 0:
+      continue
+    for g in range(26):
+      lp = 0.0
+      for (gram, c) in hist.items():
+        i = 0
+        for a in gram:
+          i = i * 26 + (a - g) % 26
+        lp = lp + c * table[i]
+      score[g] = score[g] + lp / total
+
+  maxlen = max(map(len, words_en), default=0)
+  for (g, k) in enumerate(LETTERS):
+    x = decrypt(y[:WORD_SPAN], k)
+    covered = bytearray(len(x))
+    for i in range(len(x)):
+      for l in range(3, min(maxlen, len(x) - i) + 1):
+        if x[i:i+l] in words_en:
+          covered[i:i+l] = b'\x01' * l
+    if x:
+      score[g] = score[g] + WORD_WEIGHT * sum(covered) / len(x)
+
+  ranking = sorted(zip(LETTERS, score), key=lambda kp: kp[1], reverse=True)
+  return ranking[:top]
+
+
+# streaming version of mutualCoincidence: keeps running letter counts and
+# updates the 26 shift scores after each chunk of ciphertext.
+# Yields (key, index of mutual coincidence, margin over the runner-up, z)
+# where z is the margin divided by its standard error, and stops consuming
+# the chunks as soon as z >= z_stop (and at least min_len letters were read)
+def mutualCoincidenceStream(chunks, z_stop=5.0, min_len=20):
+  f = [freq_en[chr(i)] for i in range(ord('a'), ord('z') + 1)]
+  letters = [chr(i) for i in range(ord('a'), ord('z') + 1)]
+  counts = [0] * 26
+  S = [0.0] * 26     # S[g] = sum_j counts[j] * f[j-g]
+  n = 0
+  for chunk in chunks:
+    for j in range(26):
+      c = chunk.count(letters[j])
+      if c:
+        counts[j] = counts[j] + c
+        n = n + c
+        for g in range(26):
+          S[g] = S[g] + c * f[(j - g) % 26]
+    if n == 0:
+      continue
+
+    (g2, g1) = sorted(range(26), key=lambda g: S[g])[-2:]
+    d = (S[g1] - S[g2]) / n
+    # variance of the per-letter score difference f[j-g1] - f[j-g2]
+    d2 = sum(counts[j] * (f[(j - g1) % 26] - f[(j - g2) % 26]) ** 2 for j in range(26) if counts[j]) / n
+    var = max(d2 - d * d, 0.0)
+    z = math.inf if var == 0 else d / math.sqrt(var / n)
+    yield (letters[g1], S[g1] / n, d, z)
+    if n >= min_len and z >= z_stop:
+      return
+
+
+# ranks the candidate keys of a ciphertext y by index of mutual coincidence,
+# returning the top (key, index) pairs. Rankings are kept in an LRU cache
+# keyed by the digest of y (and of the letter frequencies used to score it),
+# so that analysing the same ciphertext again costs a single hash
+def rankKeys(y, top=3):
+  h = hashlib.sha256((y + str(sorted(freq_en.items()))).encode()).hexdigest()
+  if h in rank_cache:
+    rank_cache.move_to_end(h)
+  else:
+    mutualCoincidence(y)
+    rank_cache[h] = sorted(M.items(), key=lambda kp: kp[1], reverse=True)
+    if len(rank_cache) > RANK_CACHE_SIZE:
+      rank_cache.popitem(last=False)
+  return rank_cache[h][:top]
+
+
+# load/save the ranking cache, so that it persists across runs
+def loadRankCache(filename):
+  try:
+    with open(filename, "r") as f:
+      for (h, ranking) in json.load(f):
+        rank_cache[h] = [tuple(kp) for kp in ranking]
+  except (OSError, ValueError):
+    pass
+
+def saveRankCache(filename):
+  with open(filename, "w") as f:
+    json.dump(list(rank_cache.items())[-RANK_CACHE_SIZE:], f)
+
+
 # Global variables
 
 freq_en = {}
 M = {}
+RANK_CACHE_SIZE = 1024
+RANK_CACHE_FILE = ".shift_cache.json"
+rank_cache = OrderedDict()   # digest -> [(key, index)] sorted by index
+ngram_tables = None
+words_en = frozenset()
+WORD_WEIGHT = 2.0
+WORD_SPAN = 300
 
 
 def main(args):  
-	if len(args) != 4 or args[0] != "-key" or args[2] != "-plaintext":
+	(args, profile) = instrument.parse_flag(args)
+	tables = None
+	words = None
+	if "-lang" in args and args.index("-lang") + 1 < len(args):
+		i = args.index("-lang")
+		tables = args[i + 1]
+		args = args[:i] + args[i+2:]
+	if "-words" in args and args.index("-words") + 1 < len(args):
+		i = args.index("-words")
+		words = args[i + 1]
+		args = args[:i] + args[i+2:]
+	if len(args) not in [4, 6] or args[0] != "-key" or args[2] != "-plaintext" or (len(args) == 6 and args[4] != "-stream"):
 		print("""\
-Usage: python shift.py -key k -plaintext file    
+Usage: python shift.py -key k -plaintext file [-stream chunk_size] [-lang tables.bin [-words words.txt]] [-profile [time|cprofile|tracemalloc]]
         """)
 		sys.exit(0)
 
+	if profile:
+		instrument.start(profile)
 	k = args[1]
-	freq_monograms()
+	if tables:
+		freq_tables(tables)
+	else:
+		freq_monograms()
 
 	filename = args[3]
 	# change first argument to choose a different plaintext file
@@ -92,20 +254,68 @@ Usage: python shift.py -key k -plaintext file
 	y = encrypt(x, k)
 	print("Ciphertext:\n" + y)
 
-	# computes the index of mutual coincidence
-	mutualCoincidence(y)
+	if len(args) == 6:
+		# analyse the ciphertext as a stream of chunks, stopping early
+		m = int(args[5])
+		read = [0]       # chars of the chunks consumed by the analysis
+		def chunks():
+			for i in range(0, len(y), m):
+				read[0] = min(i + m, len(y))
+				yield y[i:i+m]
+		print("\nStreaming analysis (chunks of " + str(m) + " chars):")
+		estimate = None
+		for (g, p, d, z) in mutualCoincidenceStream(chunks()):
+			estimate = g
+			print("key", g, "index", round(p, 5), "margin", round(d, 5), "z", round(z, 2))
+		if estimate is None:
+			print("No key estimate: the ciphertext has no letters")
+		else:
+			print("Most likely key", estimate, "after reading", read[0], "of", len(y), "chars")
+			print("\nDecrypted text:")
+			print(decrypt(y, estimate))
+		if profile:
+			instrument.dump(instrument.stop())
+		return
+
+	# computes the index of mutual coincidence (or reuses a cached ranking)
+	loadRankCache(RANK_CACHE_FILE)
+	ranking = rankKeys(y, 26)
+	saveRankCache(RANK_CACHE_FILE)
 	print("\nIndex of mutual coincidence:")
-	for (c, Mg) in M.items():
+	for (c, Mg) in sorted(ranking):
 		print(c, Mg)
 	print()
 
-	# computes the maximum index of mutual coincidence
-	(k, p) = max(M.items(), key=lambda k: k[1])
-	
-	print("Most likely key", k, "with index of mutual coincidence", p)
+	# the keys with the maximum index of mutual coincidence
+	print("Top candidate keys:")
+	for (c, Mg) in ranking[:3]:
+		print(c, Mg, decrypt(y[:40], c))
+	print()
+
+	# rescores the candidates with the n-gram tables and word list,
+	# which is more reliable on short ciphertexts (with -lang, the English
+	# word list is replaced by -words, or dropped)
+	if tables:
+		load_ngrams(tables, words)
+	else:
+		load_ngrams()
+	print("Top candidate keys by n-gram/word score:")
+	with instrument.phase("ngramRanking"):
+		top = ngramRanking(y)
+	for (c, sc) in top:
+		print(c, sc, decrypt(y[:40], c))
+	print()
+
+	(km, p) = ranking[0]
+	print("Most likely key", km, "with index of mutual coincidence", p)
+	(kn, sn) = top[0]
+	print("Most likely key", kn, "with n-gram/word score", sn)
 	
-	print("\nDecrypted text:")
-	print(decrypt(y, k))
+	# the n-gram/word score is the more accurate of the two, so it picks the key
+	print("\nDecrypted text (key " + kn + ", chosen by the n-gram/word score):")
+	print(decrypt(y, kn))
+	if profile:
+		instrument.dump(instrument.stop())
 	
 if __name__ == '__main__':
     main(sys.argv[1:])
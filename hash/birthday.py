@@ -1,25 +1,32 @@
 # A big-space birthday attack
 
-import hashlib
+import os
+import sys
 import random
 import argparse
+from providers import PROVIDERS, get_provider, benchmark, print_benchmark
+from study import parse_bits, run_study, print_study
 
-def truncated_hash(input_string, bit_length):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import instrument
+
+SHA256 = get_provider("sha256")
+
+def truncated_hash(input_string, bit_length, provider=SHA256):
     """
     Computes a truncated hash of a string.
     
     Args:
         input_string (str): Input string to hash.
         bit_length (int): Number of bits to keep from the hash.
+        provider (HashProvider): Hash function to use (default: SHA-256).
         
     Returns:
         int: Truncated hash as an integer.
     """
-    full_hash = hashlib.sha256(input_string.encode()).hexdigest()
-    truncated = int(full_hash, 16) & ((1 << bit_length) - 1)
-    return truncated
+    return provider.truncated(input_string.encode(), bit_length)
 
-def birthday_attack(bit_length, max_attempts, input_length):
+def birthday_attack(bit_length, max_attempts, input_length, provider=SHA256, rng=random, stats=None):
     """
     Performs a big-space birthday attack on a hash function.
     
@@ -27,18 +34,27 @@ def birthday_attack(bit_length, max_attempts, input_length):
         bit_length (int): Bit length of the truncated hash.
         max_attempts (int): Maximum number of attempts to find a collision.
         input_length (int): Length of random input strings.
+        provider (HashProvider): Hash function to use (default: SHA-256).
+        rng (random.Random): Source of the random inputs (default: module random).
+        stats (dict): If given, receives the number of attempts made.
         
     Returns:
         tuple: A collision pair (x, x') if found, otherwise None.
     """
+    if instrument.enabled:
+        return profiled_birthday_attack(bit_length, max_attempts, input_length, provider, rng, stats)
+
     hash_table = {}  # Mapping hash values -> preimage
     
-    for _ in range(max_attempts):
+    for i in range(max_attempts):
+        if stats is not None:
+            stats["attempts"] = i + 1
+
         # Generate a random input of specified length
-        x = ''.join(random.choices('abcdefghijklmnopqrstuvwxyz', k=input_length))
+        x = ''.join(rng.choices('abcdefghijklmnopqrstuvwxyz', k=input_length))
         
         # Compute its truncated hash
-        h_x = truncated_hash(x, bit_length)
+        h_x = truncated_hash(x, bit_length, provider)
         
         # Check for a collision
         if h_x in hash_table and hash_table[h_x] != x:
@@ -49,24 +65,75 @@ def birthday_attack(bit_length, max_attempts, input_length):
     
     return None  # No collision found within max_attempts
 
+def profiled_birthday_attack(bit_length, max_attempts, input_length, provider=SHA256, rng=random, stats=None):
+    """
+    Same as birthday_attack, timing its generate, hash and table phases.
+
+    Kept apart from birthday_attack so that the attack pays nothing for the
+    phase timers when instrumentation is disabled.
+    """
+    hash_table = {}
+
+    for i in range(max_attempts):
+        if stats is not None:
+            stats["attempts"] = i + 1
+        with instrument.phase("generate"):
+            x = ''.join(rng.choices('abcdefghijklmnopqrstuvwxyz', k=input_length))
+        with instrument.phase("hash"):
+            h_x = truncated_hash(x, bit_length, provider)
+        instrument.count("hashes")
+        with instrument.phase("table"):
+            if h_x in hash_table and hash_table[h_x] != x:
+                return hash_table[h_x], x
+            hash_table[h_x] = x
+
+    return None
+
 if __name__ == "__main__":
     # Command-line argument parsing
     parser = argparse.ArgumentParser(description="Birthday attack on a hash function.")
     parser.add_argument("-b", "--bit-length",   type=int, default=40,      help="Number of bits for the truncated hash (default: 24).")
     parser.add_argument("-a", "--attempts",     type=int, default=1200000, help="Number of attempts to find a collision (default: 100000).")
     parser.add_argument("-l", "--input-length", type=int, default=10,      help="Length of random input strings (default: 10).")
+    parser.add_argument("-H", "--hash",         default="sha256", choices=PROVIDERS, help="Hash function (default: sha256).")
+    parser.add_argument("--benchmark",          action='store_true',       help="Run the attack with every hash function and report hashes per second.")
+    parser.add_argument("--study",              type=int, metavar="M",     help="Run M independent attacks per bit length and report the distribution of attempts.")
+    parser.add_argument("--bits",               default=None,              help="Bit lengths of the study, as a list (8,12) or a range (8:20:2) (default: --bit-length).")
+    parser.add_argument("--seed",               type=int, default=0,       help="Seed of the first trial of the study (default: 0).")
+    parser.add_argument("--workers",            type=int, default=None,    help="Worker processes of the study (default: one per core).")
+    parser.add_argument("--profile",            nargs='?', const="time", choices=instrument.CAPTURE_MODES, help="Dump a per-phase time breakdown as JSON on stderr (optionally with a cprofile or tracemalloc capture).")
     
     args = parser.parse_args()
     bit_length = args.bit_length
     max_attempts = args.attempts
     input_length = args.input_length
+    provider = get_provider(args.hash)
     
-    print(f"Attempting a birthday attack on a {bit_length}-bit hash...")
+    if args.benchmark:
+        print(f"Benchmarking a birthday attack on a {bit_length}-bit hash with {max_attempts} attempts...")
+        print_benchmark(benchmark(lambda p: birthday_attack(bit_length, max_attempts, input_length, p), bit_length))
+        exit(0)
+
+    bit_lengths = parse_bits(args.bits) if args.study and args.bits else [bit_length]
+    if max(bit_lengths) > provider.max_bits:
+        parser.error(f"{provider.name} digests have only {provider.max_bits} bits, cannot truncate to {max(bit_lengths)}")
+
+    if args.study:
+        print(f"Studying {args.study} birthday attacks per bit length with {max_attempts} attempts...")
+        print_study(run_study(birthday_attack, "birthday", args.hash, bit_lengths, args.study, args.seed, args.workers,
+                              max_attempts=max_attempts, input_length=input_length))
+        exit(0)
+
+    print(f"Attempting a birthday attack on a {bit_length}-bit {provider.name} hash...")
     print(f"Using {max_attempts} attempts with random strings of length {input_length}.")
 
-    collision = birthday_attack(bit_length, max_attempts, input_length)
+    if args.profile:
+        instrument.start(args.profile)
+    collision = birthday_attack(bit_length, max_attempts, input_length, provider)
+    if args.profile:
+        instrument.dump(instrument.stop())
     if collision:
         print(f"Collision found!\nString 1: {collision[0]}\nString 2: {collision[1]}")
-        print(f"Hash: {truncated_hash(collision[0], bit_length):06x}")
+        print(f"Hash: {truncated_hash(collision[0], bit_length, provider):06x}")
     else:
         print("No collision found within the attempt limit.")
\ No newline at end of file
@@ -0,0 +1,121 @@
+# A multi-collision (r-way) search on a truncated hash
+
+import math
+import time
+import argparse
+import multiprocessing
+from collections import deque
+from itertools import islice
+from array import array
+from birthday import truncated_hash
+
+def input_of_seed(seed):
+    """
+    The input string generated by a seed.
+    """
+    return f"m{seed}"
+
+def hash_range(bit_length, lo, hi):
+    # truncated hashes of the inputs of seeds lo..hi-1
+    return array('Q', (truncated_hash(input_of_seed(s), bit_length) for s in range(lo, hi)))
+
+def bucket_members(bit_length, buckets, lo, hi):
+    # (hash, seed) pairs of the seeds lo..hi-1 falling in the given buckets
+    return [(h, s) for (s, h) in enumerate(hash_range(bit_length, lo, hi), lo) if h in buckets]
+
+def expected_hashes(bit_length, r):
+    """
+    Approximate number of hashes for the first r-way collision among
+    2^bit_length buckets: (r! * 2^(bit_length*(r-1)))^(1/r).
+    """
+    return (math.factorial(r) * 2.0 ** (bit_length * (r - 1))) ** (1 / r)
+
+def multicollision(bit_length, r, wanted=1, max_seeds=1 << 30, workers=None, batch=50000, progress=None):
+    """
+    Finds r-way collisions: r inputs with the same truncated hash.
+
+    The first pass only keeps a saturating byte counter per bucket, in a
+    single array of 2^bit_length bytes, while batches of seeds are hashed
+    in parallel. Once enough buckets reach r inputs, a second pass hashes
+    the same seeds again and keeps only the inputs falling in those buckets.
+
+    Args:
+        bit_length (int): Bit length of the truncated hash (up to about 32).
+        r (int): Number of inputs of a collision.
+        wanted (int): Number of r-way collisions to find.
+        max_seeds (int): Maximum number of inputs to hash.
+        workers (int): Number of worker processes (default: one per core).
+        batch (int): Seeds hashed per task.
+        progress (callable): If given, called after each batch with the
+            number of seeds hashed and the bucket occupancy (number of
+            buckets holding 0, 1, ..., r-1 and at least r inputs).
+
+    Returns:
+        dict: Maps the hash of each r-way collision found to its inputs.
+    """
+    counts = array('B', bytes(1 << bit_length))
+    hist = [1 << bit_length] + [0] * r     # buckets holding 0, 1, ..., r-1 and r+ inputs
+    full = []
+    seeds = 0
+    tasks = ((bit_length, lo, min(lo + batch, max_seeds)) for lo in range(0, max_seeds, batch))
+    with multiprocessing.Pool(workers) as pool:
+        # only a few batches per worker are in flight, refilled in order as
+        # they come back, so an early stop leaves no backlog of queued tasks
+        window = 2 * (workers or multiprocessing.cpu_count())
+        pending = deque(pool.apply_async(hash_range, t) for t in islice(tasks, window))
+        while pending:
+            hashes = pending.popleft().get()
+            for t in islice(tasks, 1):
+                pending.append(pool.apply_async(hash_range, t))
+            for h in hashes:
+                c = counts[h]
+                if c < r:
+                    hist[c] -= 1
+                    hist[c + 1] += 1
+                    if c + 1 == r:
+                        full.append(h)
+                if c < 255:
+                    counts[h] = c + 1
+            seeds = seeds + len(hashes)
+            if progress:
+                progress(seeds, list(hist))
+            if len(full) >= wanted:
+                break
+        pool.terminate()
+
+    buckets = frozenset(full[:wanted])
+    found = {h: [] for h in buckets}
+    tasks = [(bit_length, buckets, lo, min(lo + batch, seeds)) for lo in range(0, seeds, batch)]
+    with multiprocessing.Pool(workers) as pool:
+        for part in pool.starmap(bucket_members, tasks):
+            for (h, s) in part:
+                found[h].append(input_of_seed(s))
+    return found
+
+if __name__ == "__main__":
+    # Command-line argument parsing
+    parser = argparse.ArgumentParser(description="Multi-collision (r-way) search on a hash function.")
+    parser.add_argument("-b", "--bit-length", type=int, default=24,    help="Number of bits for the truncated hash (default: 24).")
+    parser.add_argument("-r", "--ways",       type=int, default=3,     help="Number of inputs with the same hash (default: 3).")
+    parser.add_argument("-c", "--count",      type=int, default=1,     help="Number of multi-collisions to find (default: 1).")
+    parser.add_argument("-a", "--attempts",   type=int, default=1 << 30, help="Maximum number of inputs to hash.")
+    parser.add_argument("-w", "--workers",    type=int, default=None,  help="Worker processes (default: one per core).")
+    parser.add_argument("-v", "--verbose",    action='store_true',     help="Report the bucket occupancy after each batch.")
+
+    args = parser.parse_args()
+    bit_length = args.bit_length
+    r = args.ways
+
+    def report(seeds, hist):
+        print(f"{seeds} inputs, buckets by occupancy (0..{r - 1}, {r}+): {hist}")
+
+    print(f"Looking for {args.count} {r}-way collisions on a {bit_length}-bit hash "
+          f"(about {expected_hashes(bit_length, r):.0f} hashes for the first one)...")
+    start = time.perf_counter()
+    found = multicollision(bit_length, r, args.count, args.attempts, args.workers,
+                           progress=report if args.verbose else None)
+    print(f"Search took {time.perf_counter() - start:.1f} s.")
+    for (h, inputs) in found.items():
+        print(f"Hash {h:x}: {' '.join(inputs)}")
+    if len(found) < args.count:
+        print(f"Only {len(found)} found within the attempt limit.")
@@ -0,0 +1,234 @@
+# Multi-target and claw search on a truncated hash
+
+import time
+import heapq
+import random
+import argparse
+import tempfile
+import multiprocessing
+from array import array
+from bisect import bisect_left
+from birthday import truncated_hash
+
+MASK64 = (1 << 64) - 1
+# odd multipliers deriving the Bloom filter positions from a hash value
+BLOOM_MULTIPLIERS = [0x9e3779b97f4a7c15, 0xc2b2ae3d27d4eb4f, 0x165667b19e3779f9,
+                     0xd6e8feb86659fd93, 0xff51afd7ed558ccd, 0xc4ceb9fe1a85ec53]
+
+class BloomFilter:
+    """
+    A Bloom filter on integers that are already uniformly distributed
+    (truncated hashes), so that positions are cheap multiplicative hashes.
+
+    Args:
+        n (int): Expected number of entries.
+        bits_per_entry (int): Size of the filter per entry (default: 10,
+            about 1% false positives with 6 positions).
+    """
+
+    def __init__(self, n, bits_per_entry=10):
+        self.log_size = max(3, (n * bits_per_entry - 1).bit_length())
+        self.bits = bytearray(1 << (self.log_size - 3))
+        self.shift = 64 - self.log_size
+        self.multipliers = BLOOM_MULTIPLIERS[:max(1, min(6, round(0.69 * bits_per_entry)))]
+
+    def add(self, h):
+        for c in self.multipliers:
+            p = ((h + 1) * c & MASK64) >> self.shift
+            self.bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, h):
+        for c in self.multipliers:
+            p = ((h + 1) * c & MASK64) >> self.shift
+            if not self.bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+def read_run(f, block=1 << 12):
+    """
+    Reads back a run of (hash, tag) pairs spilled to a file, block by block.
+    """
+    f.seek(0)
+    while True:
+        a = array('Q')
+        try:
+            a.fromfile(f, 2 * block)
+        except EOFError:
+            pass
+        if not a:
+            return
+        yield from zip(a[0::2], a[1::2])
+
+class TargetSet:
+    """
+    A set of target hashes with a tag per entry (e.g. the index of the input
+    producing it), behind a Bloom filter.
+
+    The hashes are kept in a sorted array of 64-bit integers, with the tags
+    in a parallel array of 32-bit integers (12 bytes per target). Runs of
+    chunk entries are sorted and spilled to temporary files, then merged
+    into the arrays, so building the set never holds more than one run
+    outside them.
+
+    Args:
+        pairs (iterable): At most n (hash, tag) pairs, with hashes of at most
+            64 bits.
+        n (int): Number of pairs (to size the Bloom filter and the arrays).
+        chunk (int): Pairs sorted at a time before merging (bounds memory).
+    """
+
+    def __init__(self, pairs, n, chunk=1 << 18):
+        self.bloom = BloomFilter(n)
+        runs = []
+        run_hashes = array('Q')
+        run_tags = array('Q')
+        for (h, tag) in pairs:
+            self.bloom.add(h)
+            run_hashes.append(h)
+            run_tags.append(tag)
+            if len(run_hashes) == chunk:
+                runs.append(self._spill(run_hashes, run_tags))
+                run_hashes = array('Q')
+                run_tags = array('Q')
+        if runs:
+            runs.append(self._spill(run_hashes, run_tags))
+            merged = heapq.merge(*(read_run(f) for f in runs))
+        else:
+            order = sorted(range(len(run_hashes)), key=run_hashes.__getitem__)
+            merged = ((run_hashes[i], run_tags[i]) for i in order)
+        # preallocated, so that growing them never holds two copies
+        self.hashes = array('Q', [0]) * n
+        self.tags = array('I' if n <= 1 << 32 else 'Q', [0]) * n
+        count = 0
+        for (h, tag) in merged:
+            self.hashes[count] = h
+            self.tags[count] = tag
+            count += 1
+        del self.hashes[count:]
+        del self.tags[count:]
+        for f in runs:
+            f.close()
+
+    @staticmethod
+    def _spill(run_hashes, run_tags):
+        # writes a run sorted by hash, as interleaved (hash, tag) pairs
+        pairs = array('Q')
+        for i in sorted(range(len(run_hashes)), key=run_hashes.__getitem__):
+            pairs.append(run_hashes[i])
+            pairs.append(run_tags[i])
+        f = tempfile.TemporaryFile()
+        pairs.tofile(f)
+        return f
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def lookup(self, h):
+        """
+        Returns the tags of all the targets equal to h.
+        """
+        if h not in self.bloom:
+            return []
+        i = bisect_left(self.hashes, h)
+        found = []
+        while i < len(self.hashes) and self.hashes[i] == h:
+            found.append(self.tags[i])
+            i += 1
+        return found
+
+def family_input(prefix, i):
+    """
+    The i-th input of the family of strings starting with prefix.
+    """
+    return f"{prefix}{i}"
+
+_targets = None
+
+def _init_worker(targets):
+    global _targets
+    _targets = targets
+
+def search_range(prefix, bit_length, lo, hi):
+    # hits (candidate index, target tag) of family inputs lo..hi-1
+    hits = []
+    for i in range(lo, hi):
+        for tag in _targets.lookup(truncated_hash(family_input(prefix, i), bit_length)):
+            hits.append((i, tag))
+    return hits
+
+def search(targets, prefix, bit_length, num_candidates, workers=None, batch=20000):
+    """
+    Hashes num_candidates inputs of a family and reports every input whose
+    truncated hash is in the target set. Batches of candidates are hashed
+    in parallel; every worker gets the target set once.
+
+    Args:
+        targets (TargetSet): Target hashes.
+        prefix (str): Prefix of the candidate family.
+        bit_length (int): Bit length of the truncated hash.
+        num_candidates (int): Number of candidates.
+        workers (int): Number of worker processes (default: one per core).
+        batch (int): Candidates per task.
+
+    Returns:
+        list: All the hits, as (candidate index, target tag) pairs.
+    """
+    tasks = [(prefix, bit_length, lo, min(lo + batch, num_candidates)) for lo in range(0, num_candidates, batch)]
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(targets,)) as pool:
+        parts = pool.starmap(search_range, tasks)
+    return [hit for part in parts for hit in part]
+
+def family_targets(prefix, bit_length, n):
+    """
+    (hash, index) pairs of the first n inputs of a family (for claws).
+    """
+    return ((truncated_hash(family_input(prefix, i), bit_length), i) for i in range(n))
+
+def file_targets(filename, bit_length):
+    """
+    (hash, line number) pairs of a file of hexadecimal hashes, one per line,
+    truncated to their last bit_length bits (as truncated_hash does).
+    """
+    mask = (1 << bit_length) - 1
+    with open(filename, "r") as f:
+        for (i, s) in enumerate(f):
+            if s.strip():
+                yield (int(s, 16) & mask, i)
+
+if __name__ == "__main__":
+    # Command-line argument parsing
+    parser = argparse.ArgumentParser(description="Multi-target and claw search on a truncated hash.")
+    parser.add_argument("mode", choices=["targets", "claw"], help="Search a target set, or claws between two input families.")
+    parser.add_argument("-b", "--bit-length",  type=int, default=32,      help="Number of bits for the truncated hash (default: 32).")
+    parser.add_argument("-t", "--targets",     default=None,              help="File of target hashes in hexadecimal, one per line (targets mode).")
+    parser.add_argument("-r", "--random-targets", type=int, default=0,    help="Use this many random targets instead of a file (targets mode).")
+    parser.add_argument("-A", "--family-a",    type=int, default=100000,  help="Number of inputs of the first family (claw mode, default: 100000).")
+    parser.add_argument("-n", "--candidates",  type=int, default=1000000, help="Number of candidate inputs (default: 1000000).")
+    parser.add_argument("-w", "--workers",     type=int, default=None,    help="Worker processes (default: one per core).")
+
+    args = parser.parse_args()
+    bit_length = args.bit_length
+
+    start = time.perf_counter()
+    if args.mode == "claw":
+        targets = TargetSet(family_targets("A", bit_length, args.family_a), args.family_a)
+        prefix = "B"
+    elif args.targets:
+        n = sum(1 for _ in open(args.targets))
+        targets = TargetSet(file_targets(args.targets, bit_length), n)
+        prefix = "x"
+    else:
+        targets = TargetSet(((random.getrandbits(bit_length), i) for i in range(args.random_targets)), args.random_targets)
+        prefix = "x"
+    print(f"Loaded {len(targets)} targets on a {bit_length}-bit hash in {time.perf_counter() - start:.1f} s.")
+
+    start = time.perf_counter()
+    hits = search(targets, prefix, bit_length, args.candidates, args.workers)
+    elapsed = time.perf_counter() - start
+    for (i, tag) in hits:
+        x = family_input(prefix, i)
+        if args.mode == "claw":
+            print(f"Claw: {family_input('A', tag)} {x} (hash {truncated_hash(x, bit_length):x})")
+        else:
+            print(f"Hit: {x} matches target {tag} (hash {truncated_hash(x, bit_length):x})")
+    print(f"{len(hits)} hits among {args.candidates} candidates ({args.candidates / elapsed:.0f} candidates/s).")
@@ -0,0 +1,118 @@
+# Hash providers for the birthday attacks
+
+import time
+import hashlib
+import zlib
+
+def truncate(digest, bit_length):
+    """
+    The last bit_length bits of a digest, as an integer.
+    """
+    return int.from_bytes(digest, 'big') & ((1 << bit_length) - 1)
+
+class HashProvider:
+    """
+    A hash function used by the birthday attacks.
+
+    Args:
+        name (str): Name of the hash function.
+        digest (callable): Function (data, bit_length) -> bytes computing a
+            digest of at least bit_length bits.
+        max_bits (int): Size of the largest digest the function can produce.
+    """
+
+    def __init__(self, name, digest, max_bits):
+        self.name = name
+        self.digest = digest
+        self.max_bits = max_bits
+        self.calls = 0
+
+    def truncated(self, data, bit_length):
+        """
+        Computes the hash of data, truncated to its last bit_length bits.
+
+        Args:
+            data (bytes): Input to hash.
+            bit_length (int): Number of bits to keep from the hash.
+
+        Returns:
+            int: Truncated hash as an integer.
+
+        Raises:
+            ValueError: If bit_length exceeds the digest size.
+        """
+        if bit_length > self.max_bits:
+            raise ValueError(f"{self.name} digests have only {self.max_bits} bits, cannot truncate to {bit_length}")
+        self.calls += 1
+        return truncate(self.digest(data, bit_length), bit_length)
+
+def _hashlib(name):
+    f = getattr(hashlib, name)
+    return lambda data, bit_length: f(data).digest()
+
+def _blake2b(data, bit_length):
+    # BLAKE2 computes a digest of the requested size natively
+    return hashlib.blake2b(data, digest_size=(bit_length + 7) // 8).digest()
+
+def _crc32(data, bit_length):
+    # Non-cryptographic reference hash: cheap, for tests and scaling studies
+    return zlib.crc32(data).to_bytes(4, 'big')
+
+PROVIDERS = {
+    "sha256":   lambda: HashProvider("sha256", _hashlib("sha256"), 256),
+    "sha1":     lambda: HashProvider("sha1", _hashlib("sha1"), 160),
+    "md5":      lambda: HashProvider("md5", _hashlib("md5"), 128),
+    "sha3_256": lambda: HashProvider("sha3_256", _hashlib("sha3_256"), 256),
+    "blake2b":  lambda: HashProvider("blake2b", _blake2b, 512),
+    "crc32":    lambda: HashProvider("crc32", _crc32, 32),
+}
+
+def get_provider(name="sha256"):
+    """
+    Returns a fresh provider (with its own call counter) for a hash function.
+
+    Args:
+        name (str): One of the names in PROVIDERS.
+
+    Returns:
+        HashProvider: The provider.
+    """
+    try:
+        return PROVIDERS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown hash function {name} (choose from {', '.join(PROVIDERS)})")
+
+def benchmark(attack, bit_length, names=None):
+    """
+    Runs an attack once with every hash provider and measures its speed.
+
+    Args:
+        attack (callable): Function provider -> collision (or None).
+        bit_length (int): Bit length of the truncated hash used by attack.
+        names (list): Providers to benchmark (default: all).
+
+    Returns:
+        list: One (name, hash calls, seconds, hashes per second, collision)
+            tuple per provider; providers whose digests are shorter than
+            bit_length are skipped.
+    """
+    rows = []
+    for name in names or PROVIDERS:
+        provider = get_provider(name)
+        if provider.max_bits < bit_length:
+            continue
+        start = time.perf_counter()
+        collision = attack(provider)
+        elapsed = time.perf_counter() - start
+        rate = provider.calls / elapsed if elapsed > 0 else float('inf')
+        rows.append((name, provider.calls, elapsed, rate, collision))
+    return rows
+
+def print_benchmark(rows):
+    """
+    Prints the result of benchmark as a table.
+    """
+    print(f"{'hash':<10} {'calls':>10} {'seconds':>9} {'hashes/s':>12}  collision")
+    for (name, calls, elapsed, rate, collision) in rows:
+        found = "yes" if collision else "no"
+        print(f"{name:<10} {calls:>10} {elapsed:>9.3f} {rate:>12.0f}  {found}")
@@ -0,0 +1,253 @@
+# Rainbow tables for preimages of truncated hashes
+
+import os
+import sys
+import mmap
+import time
+import heapq
+import random
+import struct
+import argparse
+import importlib
+import multiprocessing
+from array import array
+from bisect import bisect_left
+from providers import truncate
+
+# same truncated hash as the small-space birthday attack
+smallspace = importlib.import_module("smallspace-birthday")
+
+# File format: header (magic, bit length, chain length, number of chains),
+# then (endpoint, start point) pairs as native uint64, sorted by endpoint
+MAGIC = b'RNBW'
+HEADER = struct.Struct('<4sIII')
+
+def hex_of_int(v, bit_length):
+    """
+    Formats an integer of bit_length bits as an input of the small-space
+    truncated_hash: a hexadecimal string with an even number of digits.
+    """
+    num_hex_digits = (bit_length + 3) // 4
+    h = f"{v:0{num_hex_digits}x}"
+    if len(h) % 2 != 0:
+        h = '0' + h
+    return h
+
+def hash_int(v, bit_length):
+    """
+    Computes the truncated hash of the input v, as an integer.
+
+    Same hash as truncated_hash of the small-space birthday attack on the
+    input hex_of_int(v), whose bytes are the (bit_length + 7) // 8
+    big-endian bytes of v: they are hashed directly, without going through
+    hexadecimal strings.
+    """
+    return smallspace.truncated_hash_bytes(v.to_bytes((bit_length + 7) // 8, 'big'), bit_length)
+
+def reduce_hash(h, i, bit_length):
+    """
+    Reduction function of column i: maps a hash back to an input.
+    """
+    return (h + i) & ((1 << bit_length) - 1)
+
+def chain_end(start, chain_length, bit_length, first=0):
+    """
+    Walks a chain from column first up to its endpoint.
+
+    Args:
+        start (int): Input at column first.
+        chain_length (int): Number of columns of the table.
+        bit_length (int): Bit length of the truncated hash.
+        first (int): Column of start.
+
+    Returns:
+        int: The endpoint of the chain.
+    """
+    # hash_int and reduce_hash, inlined: this loop is the cost of building
+    # and of every lookup. It uses the digest and truncation of the same
+    # provider, skipping only its call counter
+    num_bytes = (bit_length + 7) // 8
+    mask = (1 << bit_length) - 1
+    digest = smallspace.SHA256.digest
+    x = start
+    for i in range(first, chain_length):
+        x = (truncate(digest(x.to_bytes(num_bytes, 'big'), bit_length), bit_length) + i) & mask
+    return x
+
+def build_chunk(bit_length, chain_length, lo, hi):
+    # (endpoint, start point) pairs of the start points lo..hi-1, spread over
+    # the input space by an odd multiplier, packed and sorted by endpoint
+    mask = (1 << bit_length) - 1
+    chains = []
+    for j in range(lo, hi):
+        start = (j * 0x9e3779b97f4a7c15) & mask
+        chains.append((chain_end(start, chain_length, bit_length), start))
+    chains.sort()
+    pairs = array('Q')
+    for (end, start) in chains:
+        pairs.append(end)
+        pairs.append(start)
+    return pairs
+
+def unpack_pairs(pairs):
+    return zip(pairs[0::2], pairs[1::2])
+
+def write_pairs(f, pairs):
+    if sys.byteorder == 'big':
+        pairs.byteswap()
+    f.write(pairs.tobytes())
+
+def build_table(filename, bit_length, chain_length, num_chains, workers=None):
+    """
+    Builds a rainbow table in parallel and writes it to filename.
+
+    Chains that merge into the same endpoint are kept only once.
+
+    Args:
+        filename (str): Output file.
+        bit_length (int): Bit length of the truncated hash (up to about 40).
+        chain_length (int): Number of columns (hashes per chain).
+        num_chains (int): Number of chains.
+        workers (int): Number of worker processes (default: one per core).
+
+    Returns:
+        int: Number of distinct endpoints written.
+    """
+    step = max(1, min(10000, num_chains // (4 * (workers or os.cpu_count() or 1))))
+    tasks = [(bit_length, chain_length, lo, min(lo + step, num_chains)) for lo in range(0, num_chains, step)]
+    with multiprocessing.Pool(workers) as pool:
+        parts = pool.starmap(build_chunk, tasks)
+
+    # merge the sorted chunks, dropping adjacent duplicate endpoints, and
+    # stream the pairs to the file (the header gets the count at the end)
+    num_ends = 0
+    last = None
+    block = array('Q')
+    with open(filename, "wb") as f:
+        f.write(HEADER.pack(MAGIC, bit_length, chain_length, 0))
+        for (end, start) in heapq.merge(*map(unpack_pairs, parts)):
+            if end == last:
+                continue
+            last = end
+            block.append(end)
+            block.append(start)
+            num_ends += 1
+            if len(block) >= 1 << 16:
+                write_pairs(f, block)
+                block = array('Q')
+        write_pairs(f, block)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, bit_length, chain_length, num_ends))
+    return num_ends
+
+class RainbowTable:
+    """
+    A rainbow table file, memory-mapped for lookups.
+
+    Args:
+        filename (str): File written by build_table.
+    """
+
+    def __init__(self, filename):
+        with open(filename, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.bit_length, self.chain_length, self.num_chains) = HEADER.unpack_from(self.mm)
+        assert magic == MAGIC, f"{filename} is not a rainbow table"
+        if sys.byteorder == 'big':
+            pairs = array('Q', self.mm[HEADER.size:])
+            pairs.byteswap()
+            pairs = memoryview(pairs)
+        else:
+            pairs = memoryview(self.mm)[HEADER.size:].cast('Q')
+        self.ends = pairs[0::2]
+        self.starts = pairs[1::2]
+
+    def find_start(self, endpoint):
+        i = bisect_left(self.ends, endpoint)
+        if i < len(self.ends) and self.ends[i] == endpoint:
+            return self.starts[i]
+        return None
+
+    def preimage(self, h):
+        """
+        Looks for a preimage of a truncated hash.
+
+        Args:
+            h (int): Truncated hash.
+
+        Returns:
+            str: Input x (hexadecimal) with truncated_hash(x) == h, or None.
+        """
+        b = self.bit_length
+        t = self.chain_length
+        for p in range(t - 1, -1, -1):
+            # assume h is the hash at column p: walk to the endpoint
+            start = self.find_start(chain_end(reduce_hash(h, p, b), t, b, p + 1))
+            if start is None:
+                continue
+            # rebuild the chain up to column p (the match may be a false alarm)
+            x = start
+            for i in range(p):
+                x = reduce_hash(hash_int(x, b), i, b)
+            if hash_int(x, b) == h:
+                return hex_of_int(x, b)
+        return None
+
+_table = None
+
+def _open_table(filename):
+    global _table
+    _table = RainbowTable(filename)
+
+def _preimage(h):
+    return _table.preimage(h)
+
+def lookup_batch(filename, hashes, workers=None):
+    """
+    Looks for preimages of many truncated hashes, in parallel.
+
+    Args:
+        filename (str): Rainbow table file.
+        hashes (list): Truncated hashes (int).
+        workers (int): Number of worker processes (default: one per core).
+
+    Returns:
+        list: One preimage (or None) per hash.
+    """
+    with multiprocessing.Pool(workers, initializer=_open_table, initargs=(filename,)) as pool:
+        return pool.map(_preimage, hashes, chunksize=max(1, len(hashes) // (4 * (workers or os.cpu_count() or 1))))
+
+if __name__ == "__main__":
+    # Command-line argument parsing
+    parser = argparse.ArgumentParser(description="Rainbow tables for preimages of truncated SHA-256.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Build a table.")
+    build.add_argument("table",                    help="Output file.")
+    build.add_argument("-b", "--bit-length",       type=int, default=24,    help="Number of bits for the truncated hash (default: 24).")
+    build.add_argument("-t", "--chain-length",     type=int, default=1000,  help="Length of the chains (default: 1000).")
+    build.add_argument("-m", "--chains",           type=int, default=40000, help="Number of chains (default: 40000).")
+    build.add_argument("-w", "--workers",          type=int, default=None,  help="Worker processes (default: one per core).")
+    lookup = sub.add_parser("lookup", help="Find preimages of hashes.")
+    lookup.add_argument("table",                   help="Table file.")
+    lookup.add_argument("hashes", nargs='*',       help="Truncated hashes (hexadecimal).")
+    lookup.add_argument("-r", "--random",          type=int, default=0,     help="Also look up the hashes of this many random inputs.")
+    lookup.add_argument("-w", "--workers",         type=int, default=None,  help="Worker processes (default: one per core).")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        n = build_table(args.table, args.bit_length, args.chain_length, args.chains, args.workers)
+        print(f"Built {args.table}: {n} distinct chains of length {args.chain_length} "
+              f"on a {args.bit_length}-bit hash in {time.perf_counter() - start:.1f} s.")
+    else:
+        bit_length = RainbowTable(args.table).bit_length
+        hashes = [int(h, 16) for h in args.hashes]
+        hashes += [hash_int(random.getrandbits(bit_length), bit_length) for _ in range(args.random)]
+        start = time.perf_counter()
+        found = lookup_batch(args.table, hashes, args.workers)
+        elapsed = time.perf_counter() - start
+        for (h, x) in zip(hashes[:len(args.hashes)], found):
+            print(f"{h:x}: {x if x else 'not found'}")
+        print(f"Found {sum(1 for x in found if x)} preimages of {len(hashes)} hashes "
+              f"({1000 * elapsed / max(1, len(hashes)):.2f} ms per query).")
@@ -1,17 +1,41 @@
 # A small-space birthday attack
 
-import hashlib
+import os
+import sys
 import random
 import argparse
 import logging as log
+from providers import PROVIDERS, get_provider, benchmark, print_benchmark
+from study import parse_bits, run_study, print_study, floyd_expectation
 
-def truncated_hash(input_hex, bit_length):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import instrument
+
+SHA256 = get_provider("sha256")
+
+def truncated_hash_bytes(input_bytes, bit_length, provider=SHA256):
+    """
+    Computes a truncated hash of bytes, as an integer (the hash of
+    truncated_hash, without the hexadecimal encodings).
+
+    Args:
+        input_bytes (bytes): Input to hash.
+        bit_length (int): Number of bits to keep from the hash.
+        provider (HashProvider): Hash function to use (default: SHA-256).
+
+    Returns:
+        int: Truncated hash as an integer.
+    """
+    return provider.truncated(input_bytes, bit_length)
+
+def truncated_hash(input_hex, bit_length, provider=SHA256):
     """
     Computes a truncated hash from an input hexadecimal string.
     
     Args:
         input_hex (str): Input hexadecimal string.
         bit_length (int): Number of bits to keep from the hash.
+        provider (HashProvider): Hash function to use (default: SHA-256).
         
     Returns:
         str: Truncated hash as a hexadecimal string.
@@ -19,24 +43,24 @@ def truncated_hash(input_hex, bit_length):
     # Ensure the input is properly formatted as a hexadecimal string
     input_bytes = bytes.fromhex(input_hex)
     
-    # Compute the full SHA-256 hash of the input bytes
-    full_hash = hashlib.sha256(input_bytes).hexdigest()
-    
-    # Convert the full hash to an integer, truncate it, and return as hex
-    truncated = int(full_hash, 16) & ((1 << bit_length) - 1)
+    # Compute the hash of the input bytes, truncated to an integer, and return as hex
+    truncated = truncated_hash_bytes(input_bytes, bit_length, provider)
     h = f"{truncated:0{bit_length // 4}x}"  # Convert to zero-padded hexadecimal
     # Ensure the length is even by padding with '0' if necessary
     if len(h) % 2 != 0:
         h = '0' + h
     return h
 
-def birthday_attack(bit_length, max_attempts):
+def birthday_attack(bit_length, max_attempts, provider=SHA256, rng=random, stats=None):
     """
     Performs a small-space birthday attack on a hash function.
     
     Args:
         bit_length (int): Bit length of the truncated hash.
         max_attempts (int): Maximum number of attempts to find a collision.
+        provider (HashProvider): Hash function to use (default: SHA-256).
+        rng (random.Random): Source of the initial string (default: module random).
+        stats (dict): If given, receives the number of attempts made.
         
     Returns:
         tuple: A collision pair (x, x') if found, otherwise None.
@@ -45,7 +69,7 @@ def birthday_attack(bit_length, max_attempts):
     # Generate a random input of specified length (for testing with bit_length=8, use x0 = 84)
     num_hex_digits = bit_length // 4 if bit_length % 4 == 0 else 1 + bit_length // 4
     log.info(f"Number of hexadecimal digits: {num_hex_digits}.")
-    x0 = ''.join(random.choices('0123456789abcdef', k=num_hex_digits))
+    x0 = ''.join(rng.choices('0123456789abcdef', k=num_hex_digits))
     # Ensure the length is even by padding with '0' if necessary
     if len(x0) % 2 != 0:
         x0 = '0' + x0
@@ -55,14 +79,19 @@ def birthday_attack(bit_length, max_attempts):
     x = x0
     z = x0
 
-    for i in range(max_attempts):
-        x = truncated_hash(x, bit_length)
-        z = truncated_hash(truncated_hash(z, bit_length), bit_length)
+    # Phase 1: find x = z on the cycle (Floyd)
+    with instrument.phase("cycle"):
+        for i in range(max_attempts):
+            x = truncated_hash(x, bit_length, provider)
+            z = truncated_hash(truncated_hash(z, bit_length, provider), bit_length, provider)
 
-        log.info(f"Attempt {i+1}: x = {x}, z = {z}")
+            log.info(f"Attempt {i+1}: x = {x}, z = {z}")
+            if stats is not None:
+                stats["attempts"] = i + 1
 
-        if x == z:
-            break
+            if x == z:
+                break
+    instrument.count("hashes", 3 * (i + 1))
 
     if i == max_attempts-1:
         return None
@@ -72,15 +101,17 @@ def birthday_attack(bit_length, max_attempts):
     z = x
     x = x0
 
-    # Check for a collision
-    for j in range(1, i+1):
-        h_x = truncated_hash(x, bit_length)
-        h_z = truncated_hash(z, bit_length)
-        if h_x == h_z:
-            return x, z
+    # Phase 2: check for a collision
+    with instrument.phase("collision"):
+        for j in range(1, i+1):
+            h_x = truncated_hash(x, bit_length, provider)
+            h_z = truncated_hash(z, bit_length, provider)
+            if h_x == h_z:
+                instrument.count("hashes", 2 * j)
+                return x, z
 
-        x = h_x
-        z = h_z
+            x = h_x
+            z = h_z
 
     return None  # No collision found within max_attempts
 
@@ -90,23 +121,50 @@ if __name__ == "__main__":
     parser.add_argument("-b", "--bit-length", type=int, default=8,  help="Number of bits for the truncated hash (default: 24).")
     parser.add_argument("-a", "--attempts",   type=int, default=20, help="Number of attempts to find a collision (default: 100000).")
     parser.add_argument("-v", "--verbose",    action='store_true',  help='Verbose True/False')
+    parser.add_argument("-H", "--hash",       default="sha256", choices=PROVIDERS, help="Hash function (default: sha256).")
+    parser.add_argument("--benchmark",        action='store_true',  help="Run the attack with every hash function and report hashes per second.")
+    parser.add_argument("--study",            type=int, metavar="M", help="Run M independent attacks per bit length and report the distribution of attempts.")
+    parser.add_argument("--bits",             default=None,         help="Bit lengths of the study, as a list (8,12) or a range (8:20:2) (default: --bit-length).")
+    parser.add_argument("--seed",             type=int, default=0,  help="Seed of the first trial of the study (default: 0).")
+    parser.add_argument("--workers",          type=int, default=None, help="Worker processes of the study (default: one per core).")
+    parser.add_argument("--profile",          nargs='?', const="time", choices=instrument.CAPTURE_MODES, help="Dump a per-phase time breakdown as JSON on stderr (optionally with a cprofile or tracemalloc capture).")
 
     args = parser.parse_args()
     bit_length = args.bit_length
     max_attempts = args.attempts
+    provider = get_provider(args.hash)
 
     if args.verbose:
         log.basicConfig(format="%(levelname)s: %(message)s", level=log.DEBUG)
     else:
         log.basicConfig(format="%(levelname)s: %(message)s")
 
-    log.info(f"Attempting a birthday attack on a {bit_length}-bit hash...")
+    if args.benchmark:
+        print(f"Benchmarking a birthday attack on a {bit_length}-bit hash with {max_attempts} attempts...")
+        print_benchmark(benchmark(lambda p: birthday_attack(bit_length, max_attempts, p), bit_length))
+        exit(0)
+
+    bit_lengths = parse_bits(args.bits) if args.study and args.bits else [bit_length]
+    if max(bit_lengths) > provider.max_bits:
+        parser.error(f"{provider.name} digests have only {provider.max_bits} bits, cannot truncate to {max(bit_lengths)}")
+
+    if args.study:
+        print(f"Studying {args.study} small-space birthday attacks per bit length with {max_attempts} attempts...")
+        print_study(run_study(birthday_attack, "smallspace-birthday", args.hash, bit_lengths, args.study, args.seed, args.workers,
+                              theory=floyd_expectation, max_attempts=max_attempts))
+        exit(0)
+
+    log.info(f"Attempting a birthday attack on a {bit_length}-bit {provider.name} hash...")
     log.info(f"Using {max_attempts} attempts with random strings.")
 
-    collision = birthday_attack(bit_length, max_attempts)
+    if args.profile:
+        instrument.start(args.profile)
+    collision = birthday_attack(bit_length, max_attempts, provider)
+    if args.profile:
+        instrument.dump(instrument.stop())
     if collision:
         print(f"Collision found!\nString 1: {collision[0]}\nString 2: {collision[1]}")
         # Directly use the result of `truncated_hash` since it's already a hexadecimal string
-        print(f"Hash: {truncated_hash(collision[0], bit_length)}")
+        print(f"Hash: {truncated_hash(collision[0], bit_length, provider)}")
     else:
         print("No collision found within the attempt limit.")
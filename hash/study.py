@@ -0,0 +1,165 @@
+# Collision-time distribution studies for the birthday attacks
+
+import os
+import json
+import math
+import random
+import hashlib
+import multiprocessing
+from array import array
+from functools import partial
+from providers import get_provider
+
+CACHE_DIR = ".study_cache"
+
+def parse_bits(spec):
+    """
+    Parses a range of bit lengths.
+
+    Args:
+        spec (str): Either a comma-separated list ("8,12,16") or a range
+            "start:stop[:step]" with stop included ("8:16:2").
+
+    Returns:
+        list: The bit lengths.
+    """
+    if ':' in spec:
+        parts = [int(p) for p in spec.split(':')]
+        step = parts[2] if len(parts) > 2 else 1
+        return list(range(parts[0], parts[1] + 1, step))
+    return [int(b) for b in spec.split(',')]
+
+def run_trial(attack, hash_name, params, bit_length, seed):
+    """
+    Runs one attack with its own random generator and hash call counter.
+
+    Args:
+        attack (callable): Attack function, taking bit_length, the entries
+            of params and the keyword arguments provider, rng and stats.
+        hash_name (str): Name of the hash provider.
+        params (dict): Further arguments of the attack.
+        bit_length (int): Bit length of the truncated hash.
+        seed (int): Seed of the trial.
+
+    Returns:
+        tuple: (found, attempts, hash calls) with found 1 if a collision was found.
+    """
+    provider = get_provider(hash_name)
+    stats = {}
+    collision = attack(bit_length, **params, provider=provider, rng=random.Random(seed), stats=stats)
+    return (1 if collision else 0, stats["attempts"], provider.calls)
+
+def load_cache(config):
+    """
+    Loads the cached trials of a configuration.
+
+    Args:
+        config (dict): Attack name, hash, bit length and attack parameters.
+
+    Returns:
+        tuple: (path of the cache file, dict seed -> trial result).
+    """
+    key = hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+    path = os.path.join(CACHE_DIR, f"{config['attack']}-{config['bit_length']}-{key}.json")
+    try:
+        with open(path, "r") as f:
+            return path, {int(s): tuple(r) for (s, r) in json.load(f)["trials"].items()}
+    except (OSError, ValueError, KeyError):
+        return path, {}
+
+def save_cache(path, config, trials):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"config": config, "trials": trials}, f)
+
+def quantile(data, q):
+    """
+    Returns the q-quantile of sorted data (nearest rank).
+    """
+    return data[min(len(data) - 1, max(0, math.ceil(q * len(data)) - 1))]
+
+def birthday_expectation(bit_length):
+    """
+    Expected number of random inputs hashed until the first collision,
+    sqrt(pi/2 * 2^n).
+    """
+    return math.sqrt(math.pi / 2 * 2 ** bit_length)
+
+def floyd_expectation(bit_length):
+    """
+    Expected index at which Floyd's cycle finding meets (x_i = x_2i) on a
+    random mapping of 2^n points, (pi^2/12) * sqrt(pi/2 * 2^n), about
+    1.03 * sqrt(2^n).
+    """
+    return math.pi ** 2 / 12 * birthday_expectation(bit_length)
+
+def run_study(attack, name, hash_name, bit_lengths, trials, seed=0, workers=None, theory=birthday_expectation, **params):
+    """
+    Runs independent attacks over a range of bit lengths and summarizes the
+    number of attempts and hash calls needed to find a collision.
+
+    Trial t of every bit length uses the seed seed+t. Results are cached per
+    configuration in CACHE_DIR, so that repeated studies only run the trials
+    that are missing.
+
+    Args:
+        attack (callable): Attack function (see run_trial).
+        name (str): Name of the attack, used in the cache.
+        hash_name (str): Name of the hash provider.
+        bit_lengths (list): Bit lengths of the truncated hash.
+        trials (int): Number of trials per bit length.
+        seed (int): Seed of the first trial.
+        workers (int): Number of worker processes (default: one per core).
+        theory (callable): Expected number of attempts for a bit length, to
+            compare with the mean (default: birthday_expectation).
+        **params: Further arguments of the attack.
+
+    Returns:
+        list: One dict of statistics per bit length.
+    """
+    configs = []
+    todo = []
+    for b in bit_lengths:
+        config = {"attack": name, "hash": hash_name, "bit_length": b, **params}
+        path, cached = load_cache(config)
+        configs.append((config, path, cached))
+        todo.extend((b, s) for s in range(seed, seed + trials) if s not in cached)
+
+    if todo:
+        run = partial(run_trial, attack, hash_name, params)
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.starmap(run, todo, chunksize=max(1, len(todo) // (4 * (workers or os.cpu_count() or 1))))
+        caches = {config["bit_length"]: cached for (config, path, cached) in configs}
+        for ((b, s), r) in zip(todo, results):
+            caches[b][s] = r
+
+    summary = []
+    for (config, path, cached) in configs:
+        save_cache(path, config, cached)
+        results = [cached[s] for s in range(seed, seed + trials)]
+        attempts = array('Q', sorted(r[1] for r in results if r[0]))
+        calls = array('Q', sorted(r[2] for r in results if r[0]))
+        expected = theory(config["bit_length"])
+        stats = {"bit_length": config["bit_length"], "trials": trials,
+                 "found": len(attempts), "theory": expected}
+        if attempts:
+            mean = sum(attempts) / len(attempts)
+            stats.update({"mean": mean, "ratio": mean / expected,
+                          "q10": quantile(attempts, 0.1), "q50": quantile(attempts, 0.5),
+                          "q90": quantile(attempts, 0.9), "calls": sum(calls) / len(calls)})
+        summary.append(stats)
+    return summary
+
+def print_study(summary):
+    """
+    Prints the result of run_study as a table, comparing the mean number of
+    attempts with its theoretical expectation.
+    """
+    print(f"{'bits':>4} {'found':>9} {'q10':>9} {'median':>9} {'q90':>9} {'mean':>11} {'theory':>11} {'ratio':>6} {'hash calls':>11}")
+    for s in summary:
+        found = f"{s['found']}/{s['trials']}"
+        if s["found"]:
+            print(f"{s['bit_length']:>4} {found:>9} {s['q10']:>9} {s['q50']:>9} {s['q90']:>9} "
+                  f"{s['mean']:>11.1f} {s['theory']:>11.1f} {s['ratio']:>6.3f} {s['calls']:>11.1f}")
+        else:
+            print(f"{s['bit_length']:>4} {found:>9} {'-':>9} {'-':>9} {'-':>9} {'-':>11} {s['theory']:>11.1f} {'-':>6} {'-':>11}")
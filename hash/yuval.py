@@ -0,0 +1,150 @@
+# Yuval's birthday attack: collisions between meaningful documents
+
+import re
+import time
+import hashlib
+import argparse
+from array import array
+
+def parse_template(text):
+    """
+    Parses a document template with binary alternatives written {a|b}.
+
+    Args:
+        text (str): The template, e.g. "I {agree|consent} to {pay|give} you".
+
+    Returns:
+        list: The alternating fixed parts and choices,
+            [s0, (a0, b0), s1, (a1, b1), ..., sk], as bytes.
+    """
+    parts = re.split(r'\{([^{}|]*)\|([^{}|]*)\}', text)
+    segments = [parts[0].encode()]
+    for i in range(1, len(parts), 3):
+        segments.append((parts[i].encode(), parts[i + 1].encode()))
+        segments.append(parts[i + 2].encode())
+    return segments
+
+def num_choices(segments):
+    return len(segments) // 2
+
+def render(segments, v):
+    """
+    The variant v of a template: bit i of v selects alternative i.
+    """
+    out = [segments[0]]
+    for i in range(num_choices(segments)):
+        out.append(segments[2 * i + 1][(v >> i) & 1])
+        out.append(segments[2 * i + 2])
+    return b''.join(out).decode()
+
+def variants(segments, bit_length, hash_name="sha256"):
+    """
+    Lazily enumerates the (variant, truncated hash) pairs of a template.
+
+    The variants are visited depth-first, and the hash state of each shared
+    prefix is copied rather than recomputed, so every variant only hashes
+    the text after its last choice. Truncation keeps the last bit_length
+    bits of the digest, as in birthday.py.
+
+    Args:
+        segments (list): Template parsed by parse_template.
+        bit_length (int): Number of bits to keep from the hash.
+        hash_name (str): hashlib algorithm (default: sha256).
+
+    Yields:
+        tuple: (variant index, truncated hash as an integer).
+    """
+    mask = (1 << bit_length) - 1
+    k = num_choices(segments)
+    root = hashlib.new(hash_name)
+    root.update(segments[0])
+    stack = [(root, 0, 0)]   # (state after the prefix, next choice, bits chosen)
+    while stack:
+        (state, i, v) = stack.pop()
+        if i == k:
+            yield (v, int.from_bytes(state.digest(), 'big') & mask)
+            continue
+        for bit in [1, 0]:
+            s = state.copy()
+            s.update(segments[2 * i + 1][bit])
+            s.update(segments[2 * i + 2])
+            stack.append((s, i + 1, v | (bit << i)))
+
+class HashIndex:
+    """
+    Open-addressing hash table from truncated hashes to variant indexes,
+    stored in two flat arrays.
+
+    Args:
+        n (int): Maximum number of entries.
+    """
+
+    def __init__(self, n):
+        self.size = 1 << max(4, (2 * n - 1).bit_length())
+        self.keys = array('Q', bytes(8 * self.size))     # hash + 1, 0 if empty
+        self.values = array('Q', bytes(8 * self.size))
+
+    def _slot(self, h):
+        i = (h * 0x9e3779b97f4a7c15 >> 16) & (self.size - 1)
+        while self.keys[i] and self.keys[i] != h + 1:
+            i = (i + 1) & (self.size - 1)
+        return i
+
+    def add(self, h, v):
+        i = self._slot(h)
+        if not self.keys[i]:
+            self.keys[i] = h + 1
+            self.values[i] = v
+
+    def get(self, h):
+        i = self._slot(h)
+        return self.values[i] if self.keys[i] else None
+
+def meaningful_collision(legit, fraud, bit_length, hash_name="sha256"):
+    """
+    Finds variants of two templates with the same truncated hash.
+
+    Args:
+        legit (list): First template, parsed by parse_template.
+        fraud (list): Second template, parsed by parse_template.
+        bit_length (int): Bit length of the truncated hash.
+        hash_name (str): hashlib algorithm (default: sha256).
+
+    Returns:
+        tuple: (legit variant, fraud variant) indexes if found, otherwise None.
+    """
+    index = HashIndex(1 << num_choices(legit))
+    for (v, h) in variants(legit, bit_length, hash_name):
+        index.add(h, v)
+    for (w, h) in variants(fraud, bit_length, hash_name):
+        v = index.get(h)
+        if v is not None:
+            return (v, w)
+    return None
+
+if __name__ == "__main__":
+    # Command-line argument parsing
+    parser = argparse.ArgumentParser(description="Collisions between variants of two documents (Yuval's attack).")
+    parser.add_argument("legit",                  help="Template of the first document, with alternatives {a|b}.")
+    parser.add_argument("fraud",                  help="Template of the second document, with alternatives {a|b}.")
+    parser.add_argument("-b", "--bit-length",     type=int, default=32, help="Number of bits for the truncated hash (default: 32).")
+    parser.add_argument("-H", "--hash",           default="sha256",     help="hashlib algorithm (default: sha256).")
+
+    args = parser.parse_args()
+    bit_length = args.bit_length
+    with open(args.legit, "r") as f:
+        legit = parse_template(f.read())
+    with open(args.fraud, "r") as f:
+        fraud = parse_template(f.read())
+
+    print(f"Variants: 2^{num_choices(legit)} legit, 2^{num_choices(fraud)} fraudulent, for a {bit_length}-bit hash.")
+    start = time.perf_counter()
+    collision = meaningful_collision(legit, fraud, bit_length, args.hash)
+    print(f"Search took {time.perf_counter() - start:.1f} s.")
+    if collision:
+        x = render(legit, collision[0])
+        y = render(fraud, collision[1])
+        h = int.from_bytes(hashlib.new(args.hash, x.encode()).digest(), 'big') & ((1 << bit_length) - 1)
+        print(f"Collision found!\n--- Document 1:\n{x}\n--- Document 2:\n{y}\n--- Hash: {h:x}")
+    else:
+        print("No collision found: add more alternatives to the templates.")
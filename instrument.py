@@ -0,0 +1,141 @@
+# Lightweight instrumentation: counters and phase timers
+#
+# Everything is a no-op until start() is called: count() returns at once
+# and phase() returns a shared null context manager. That still costs a
+# call and a with block per hook, so hooks time whole phases or batches;
+# per-item loops test `enabled` once and run a separate timed copy.
+# Phases may nest (e.g. "enc" inside "exp"): each one is timed on its own.
+
+import sys
+import json
+import time
+import cProfile
+import pstats
+import tracemalloc
+from contextlib import nullcontext
+from collections import defaultdict
+
+CAPTURE_MODES = ["time", "cprofile", "tracemalloc"]
+
+enabled = False
+counters = defaultdict(int)
+seconds = defaultdict(float)
+calls = defaultdict(int)
+ops = defaultdict(int)
+
+_NULL = nullcontext()
+_capture = None
+_profiler = None
+_start = 0.0
+
+class _Phase:
+    __slots__ = ("name", "n", "t0")
+
+    def __init__(self, name, n):
+        self.name = name
+        self.n = n
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds[self.name] += time.perf_counter() - self.t0
+        calls[self.name] += 1
+        ops[self.name] += self.n
+        return False
+
+def count(name, n=1):
+    """
+    Adds n to the counter name (if instrumentation is enabled).
+    """
+    if enabled:
+        counters[name] += n
+
+def phase(name, n=1):
+    """
+    Returns a context manager timing the enclosed block as phase name,
+    which performs n operations (e.g. n experiments of a batch).
+
+    Example:
+        with instrument.phase("enc"):
+            y = P.enc(x, k)
+    """
+    return _Phase(name, n) if enabled else _NULL
+
+def start(capture="time"):
+    """
+    Enables instrumentation.
+
+    Args:
+        capture (str): "time" for counters and phase timers only,
+            "cprofile" to also run cProfile, "tracemalloc" to also trace
+            memory allocations.
+    """
+    global enabled, _capture, _profiler, _start
+    assert capture in CAPTURE_MODES, f"Unknown capture mode {capture}"
+    enabled = True
+    _capture = capture
+    if capture == "cprofile":
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    elif capture == "tracemalloc":
+        tracemalloc.start()
+    _start = time.perf_counter()
+
+def stop():
+    """
+    Disables instrumentation and returns the collected data.
+
+    Returns:
+        dict: Total time, per-phase seconds, calls, operations, share of
+            the total time and ops/sec, counters (with their rate per
+            second), and the cProfile or tracemalloc capture if requested.
+    """
+    global enabled, _profiler
+    total = time.perf_counter() - _start
+    enabled = False
+    report = {"total_seconds": total, "phases": {}, "counters": {}}
+    for (name, s) in sorted(seconds.items(), key=lambda p: -p[1]):
+        report["phases"][name] = {"seconds": s, "calls": calls[name], "ops": ops[name],
+                                  "share": s / total if total else 0.0,
+                                  "ops_per_sec": ops[name] / s if s else None}
+    for (name, c) in sorted(counters.items()):
+        report["counters"][name] = {"count": c, "per_sec": c / total if total else None}
+
+    if _capture == "cprofile":
+        _profiler.disable()
+        stats = pstats.Stats(_profiler)
+        top = sorted(stats.stats.items(), key=lambda item: -item[1][3])[:20]
+        report["cprofile"] = [{"function": f"{f}:{line}({fn})", "calls": nc, "tottime": tt, "cumtime": ct}
+                              for ((f, line, fn), (cc, nc, tt, ct, callers)) in top]
+        _profiler = None
+    elif _capture == "tracemalloc":
+        (current, peak) = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().statistics("lineno")[:10]
+        tracemalloc.stop()
+        report["tracemalloc"] = {"current_bytes": current, "peak_bytes": peak,
+                                 "top": [{"where": str(s.traceback), "bytes": s.size, "blocks": s.count} for s in top]}
+    return report
+
+def dump(report, out=sys.stderr):
+    """
+    Writes a report as JSON (on stderr by default).
+    """
+    json.dump(report, out, indent=2)
+    out.write("\n")
+
+def parse_flag(args):
+    """
+    Removes a "-profile [mode]" option from a list of command-line arguments.
+
+    Returns:
+        tuple: (remaining arguments, capture mode or None if absent).
+    """
+    for flag in ["-profile", "--profile"]:
+        if flag in args:
+            i = args.index(flag)
+            if i + 1 < len(args) and args[i + 1] in CAPTURE_MODES:
+                return (args[:i] + args[i+2:], args[i + 1])
+            return (args[:i] + args[i+1:], "time")
+    return (args, None)
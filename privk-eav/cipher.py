@@ -2,17 +2,101 @@
 
 # Container class for priv-key ciphers
 
+import os
 import sys
 import logging
+import random
 import secrets
 from abc import ABC, abstractmethod
+from array import array
+from fractions import Fraction
 from functools import reduce
+from math import prod
+from itertools import chain, islice, product, repeat
+from operator import or_, xor
 
-def int_of_chr(n):
-	return ord(n)-ord('a')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import instrument
+import z26
+from z26 import int_of_chr, chr_of_int
 
-def chr_of_int(n):
-	return chr(n + ord('a'))
+# Source of randomness of gen and exp: the system CSPRNG (as in secrets),
+# unless seeded for reproducible experiments
+rng = secrets.SystemRandom()
+
+def seed(s):
+	global rng
+	rng = secrets.SystemRandom() if s is None else random.Random(s)
+
+# translation tables between key strings and packed key symbols
+BITS_OF_STR = bytes.maketrans(b'01', b'\x00\x01')
+STR_OF_BITS = bytes.maketrans(b'\x00\x01', b'01')
+INTS_OF_STR = bytes.maketrans(bytes(range(ord('a'), ord('z') + 1)), bytes(range(26)))
+STR_OF_INTS = bytes.maketrans(bytes(range(26)), bytes(range(ord('a'), ord('z') + 1)))
+
+
+################################################################################
+## Key: packed key symbols (bits or Z26) with zero-copy repetition and padding
+################################################################################
+
+class Key:
+	# data holds one symbol per byte; the key is data repeated reps times,
+	# followed by pad zeros (neither the repetition nor the padding is stored)
+	__slots__ = ('data', 'reps', 'pad')
+
+	def __init__(self, data, reps=1, pad=0):
+		self.data = data if isinstance(data, array) else array('B', data)
+		self.reps = reps
+		self.pad = pad
+
+	def __len__(self):
+		return len(self.data) * self.reps + self.pad
+
+	def __iter__(self):
+		return chain(chain.from_iterable(repeat(self.data, self.reps)), repeat(0, self.pad))
+
+	def _at(self, i):
+		# symbol at 0 <= i < len(self)
+		return self.data[i % len(self.data)] if i < len(self.data) * self.reps else 0
+
+	def __getitem__(self, i):
+		if isinstance(i, slice):
+			# only the symbols in the slice are read
+			return [self._at(j) for j in range(*i.indices(len(self)))]
+		if i < 0:
+			i = i + len(self)
+		if not 0 <= i < len(self):
+			raise IndexError("key index out of range")
+		return self._at(i)
+
+	def __eq__(self, other):
+		try:
+			if len(self) != len(other):
+				return False
+			return all(a == b for (a,b) in zip(self, other))
+		except TypeError:
+			return NotImplemented
+
+	def __str__(self):
+		return str(list(self))
+
+	def __repr__(self):
+		return "Key(" + str(self) + ")"
+
+	def padded(self, m):
+		# view of the key padded with zeros up to length m (shares data)
+		return Key(self.data, self.reps, max(self.pad, m - len(self.data) * self.reps))
+
+	def tobytes(self):
+		return self.data.tobytes() * self.reps + bytes(self.pad)
+
+	@classmethod
+	def of_string(cls, s, table):
+		# s.replace drops the newline left by files written with a trailing \n
+		return cls(array('B', s.replace("\n", "").encode().translate(table)))
+
+	def to_string(self, table):
+		return self.tobytes().translate(table).decode()
 
 class Cipher(ABC):
 
@@ -37,12 +121,19 @@ class Cipher(ABC):
 		pass
 	
 	def exp(self,x0,x1):
-		k = self.gen()                         # generate key
+		with instrument.phase("gen"):
+			k = self.gen()                     # generate key
 		logging.info("k = " + ''.join(str(k)))		
-		b = secrets.choice([0,1])              # generate random bit
-		y = self.enc(x1 if b else x0,k)        # encrypt xb = x0 if b=0, x1 if b=1
+		b = rng.choice([0,1])              # generate random bit
+		with instrument.phase("enc"):
+			y = self.enc(x1 if b else x0,k)    # encrypt xb = x0 if b=0, x1 if b=1
 		return (b,y)
 
+	# Schemes supporting search_keys also define key_space_size(),
+	# consistent_keys(x,y) (all the keys k with enc(x,k) == y, possibly as a
+	# lazy iterator), num_consistent_keys(x,y) and prob(k) (probability of
+	# k under gen)
+
 
 ################################################################################
 ## Uncipher
@@ -51,7 +142,7 @@ class Cipher(ABC):
 class Uncipher(Cipher):
 
 	def gen(self):
-		k = secrets.randbelow(26)
+		k = rng.randrange(26)
 		return k
 
 	def enc(self,x,k):
@@ -66,6 +157,18 @@ class Uncipher(Cipher):
 	def key_of_string(self,s):
 		return int_of_chr(s)
 
+	def key_space_size(self):
+		return 26
+
+	def consistent_keys(self,x,y):
+		return list(range(26)) if x == y else []
+
+	def num_consistent_keys(self,x,y):
+		return len(self.consistent_keys(x,y))
+
+	def prob(self,k):
+		return Fraction(1,26)
+
 
 ################################################################################
 ## Shift cipher in ECB mode with uniform keys and plaintexts of arbitrary length
@@ -74,21 +177,34 @@ class Uncipher(Cipher):
 class ShiftECB(Cipher):
 
 	def gen(self):
-		k = secrets.randbelow(26)
+		k = rng.randrange(26)
 		return k
 
 	def enc(self,x,k):
 		# Ek(x1 x2 x3 ... xn,k) = (x1+k)%26 (x2+k)%26 (x3+k)%26 ... (xn+k)%26
-		return  ''.join(map(lambda n : chr_of_int((int_of_chr(n) + k)%26), x))
+		return z26.enc(x,k)
 
 	def dec(self,y,k):
-		return  ''.join(map(lambda n : chr_of_int((int_of_chr(n) - k)%26), y))
+		return z26.dec(y,k)
 
 	def string_of_key(self,k):
 		return chr_of_int(k)
 
 	def key_of_string(self,s):
 		return int_of_chr(s)
+
+	def key_space_size(self):
+		return 26
+
+	def consistent_keys(self,x,y):
+		# encrypt x with all the 26 keys at once
+		return [k for (k,row) in enumerate(z26.enc_many([x],range(26))) if row[0] == y]
+
+	def num_consistent_keys(self,x,y):
+		return len(self.consistent_keys(x,y))
+
+	def prob(self,k):
+		return Fraction(1,26)
 	
 
 ################################################################################
@@ -98,20 +214,20 @@ class ShiftECB(Cipher):
 class Shift1Unbal(Cipher):
 
 	def gen(self):
-		a = secrets.choice([0,1])
+		a = rng.choice([0,1])
 		if a==0:
 			k=25
 		else:
-			k = secrets.randbelow(25)
+			k = rng.randrange(25)
 		return k
 
 	def enc(self,x,k):
 		assert(len(x)==1),"Plaintext must have length 1"
-		return  ''.join(map(lambda n : chr_of_int((int_of_chr(n) + k)%26), x))
+		return z26.enc(x,k)
 
 	def dec(self,y,k):
-		assert(len(x)==1),"Ciphertext must have length 1"    
-		return  ''.join(map(lambda n : chr_of_int((int_of_chr(n) - k)%26), y))
+		assert(len(y)==1),"Ciphertext must have length 1"
+		return z26.dec(y,k)
 
 	def string_of_key(self,k):
 		return chr_of_int(k)
@@ -119,6 +235,21 @@ class Shift1Unbal(Cipher):
 	def key_of_string(self,s):
 		return int_of_chr(s)
 
+	def key_space_size(self):
+		return 26
+
+	def consistent_keys(self,x,y):
+		if len(x) != 1:
+			return []
+		return [k for (k,row) in enumerate(z26.enc_many([x],range(26))) if row[0] == y]
+
+	def num_consistent_keys(self,x,y):
+		return len(self.consistent_keys(x,y))
+
+	def prob(self,k):
+		# k=25 with probability 1/2, otherwise uniform in 0..24
+		return Fraction(1,2) if k==25 else Fraction(1,50)
+
 	
 ################################################################################
 ## Shift cipher in OTP mode for the first n chars, then uncipher
@@ -130,40 +261,47 @@ class ShiftLazyOTP(Cipher):
 		self.n = n
 
 	def gen(self):
-		k = []
-		for i in range(self.n):
-			k.append(secrets.randbelow(26))
+		k = Key(rng.randrange(26) for i in range(self.n))
 		return k
 
 	def enc(self,x,k):
-		d = len(x) - len(k)
-		if d>0:   # padding
-			k = k + [0] * d
-		y = []
-		for i in range(len(x)):
-			y.append(chr_of_int((int_of_chr(x[i]) + k[i])%26))
-		y = ''.join(y)
-		return y
+		k = k.padded(len(x))   # padding (zero-copy view)
+		return z26.enc_keys(x,k)
 			
 	def dec(self,y,k):
-		d = len(y) - len(k)
-		if d>0:   # padding
-			k = k + [0] * d
-		x = []
-		for i in range(len(y)):
-			x.append(chr_of_int((int_of_chr(y[i]) - k[i])%26))
-		x = ''.join(x)
-		return x
+		k = k.padded(len(y))   # padding (zero-copy view)
+		return z26.dec_keys(y,k)
 
 	def string_of_key(self,k):
-		s = ''.join(map (lambda ki : chr_of_int(ki), k))
-		return s
+		return k.to_string(STR_OF_INTS)
 
 	def key_of_string(self,s):
-		# from string to list of int
-		l = list(filter(lambda i : (i in s and i!="\n"), s))
-		k = list(map(lambda ki : int_of_chr(ki), l))
-		return k
+		return Key.of_string(s, INTS_OF_STR)
+
+	def key_space_size(self):
+		return 26 ** self.n
+
+	def key_sets(self,x,y):
+		# the possible values of each key symbol (the consistent keys are
+		# their product)
+		if len(x) != len(y):
+			return [[]]
+		ks = z26.shift_keys(x,y)
+		# after the n key symbols the padded key is 0; key symbols after
+		# the end of x are not constrained
+		if any(0 not in ki for ki in ks[self.n:]):
+			return [[]]
+		return ks[:self.n] + [range(26)] * (self.n - len(ks))
+
+	def consistent_keys(self,x,y):
+		# lazy: there are 26^(n-len(x)) keys when n > len(x)
+		return (Key(k) for k in product(*self.key_sets(x,y)))
+
+	def num_consistent_keys(self,x,y):
+		return prod(len(ki) for ki in self.key_sets(x,y))
+
+	def prob(self,k):
+		return Fraction(1,26 ** self.n)
 	
 	
 ################################################################################
@@ -172,36 +310,47 @@ class ShiftLazyOTP(Cipher):
 
 class Vigenere2Unbal(Cipher):
 	def gen(self):
-		a = secrets.choice([0,1])
-		k0 = secrets.randbelow(26)
+		a = rng.choice([0,1])
+		k0 = rng.randrange(26)
 		if a==0:
 			k1 = k0
 		else:
-			k1 = secrets.randbelow(26)
-		return [k0,k1]
+			k1 = rng.randrange(26)
+		return Key([k0,k1])
 
 	def enc(self,x,k):
 		assert(len(x)==2 and len(k)==2)
-		y0 = ''.join(map(lambda n : chr_of_int((int_of_chr(n) + k[0])%26), x[0]))
-		y1 = ''.join(map(lambda n : chr_of_int((int_of_chr(n) + k[1])%26), x[1]))		
-		return y0+y1
+		return z26.enc_keys(x,k)
 
 	def dec(self,y,k):
 		assert(len(y)==2 and len(k)==2)
-		x0 = ''.join(map(lambda n : chr_of_int((int_of_chr(n) - k[0])%26), y[0]))
-		x1 = ''.join(map(lambda n : chr_of_int((int_of_chr(n) - k[1])%26), y[1]))
-		return x0+x1
+		return z26.dec_keys(y,k)
 
 
 	def string_of_key(self,k):
-		s = ''.join(map (lambda ki : chr_of_int(ki), k))
-		return s
+		return k.to_string(STR_OF_INTS)
 
 	def key_of_string(self,s):
-		# from string to list of int
-		l = list(filter(lambda i : (i in s and i!="\n"), s))
-		k = list(map(lambda ki : int_of_chr(ki), l))
-		return k
+		return Key.of_string(s, INTS_OF_STR)
+
+	def key_space_size(self):
+		return 26 * 26
+
+	def key_sets(self,x,y):
+		if len(x) != 2 or len(y) != 2:
+			return [[]]
+		return z26.shift_keys(x,y)
+
+	def consistent_keys(self,x,y):
+		return (Key(k) for k in product(*self.key_sets(x,y)))
+
+	def num_consistent_keys(self,x,y):
+		return prod(len(ki) for ki in self.key_sets(x,y))
+
+	def prob(self,k):
+		# k0 uniform; k1 = k0 with probability 1/2, otherwise uniform
+		p = Fraction(1,2*26)
+		return Fraction(1,26) * (p + Fraction(1,2) if k[0]==k[1] else p)
 
 
 ################################################################################
@@ -214,9 +363,7 @@ class OTP(Cipher):
 		self.n = n
 		
 	def gen(self):
-		k = []
-		for i in range(self.n):
-			k.append(secrets.choice([0,1]))
+		k = Key(rng.choice([0,1]) for i in range(self.n))
 		return k
 
 	def enc(self,x,k):
@@ -236,16 +383,30 @@ class OTP(Cipher):
 		return x
 
 	def string_of_key(self,k):
-		s = ''.join(map (lambda ki : str(ki), k))
-		return s
+		return k.to_string(STR_OF_BITS)
 
 	def key_of_string(self,s):
-		# from string to list of chr
-		l = list(filter(lambda i : (i in s and i!="\n"), s))
-		# from list of chr to list of int
-		k = list(map(lambda ki : int(ki), l))
+		return Key.of_string(s, BITS_OF_STR)
+
+	# Bit-sliced experiments: T independent experiments run at once, with
+	# bit i of the T keys (plaintexts, ciphertexts) packed into the T-bit
+	# integer k[i] (x[i], y[i]); lane j of every integer is experiment j
+	def gen_sliced(self,T):
+		k = [rng.getrandbits(T) for i in range(self.n)]
 		return k
 
+	def exp_sliced(self,x0,x1,T):
+		assert (len(x0)==self.n and len(x1)==self.n), "Plaintexts must have length " + str(self.n)
+		mask = (1 << T) - 1
+		k = self.gen_sliced(T)
+		b = rng.getrandbits(T)                # one random bit per lane
+		nb = ~b & mask
+		y = []
+		for (x0i,x1i,ki) in zip(x0,x1,k):
+			xi = (b if x1i=='1' else 0) | (nb if x0i=='1' else 0)   # xb in each lane
+			y.append(xi ^ ki)
+		return (b,y)
+
 
 ################################################################################
 ## OTPlastXor: OTP where the last bit of the key if the XOR of the previous bits
@@ -258,12 +419,15 @@ class OTPlastXor(OTP):
 		self.n = n
 	
 	def gen(self):
-		k = []
-		for i in range(self.n-1):
-			k.append(secrets.choice([0,1]))
+		k = Key(rng.choice([0,1]) for i in range(self.n-1))
+
+		lb = reduce(lambda z, y: z ^ y, k.data, 0)
+		k.data.append(lb)
+		return k
 
-		lb = reduce(lambda z, y: z ^ y, k, 0)
-		k.append(lb)
+	def gen_sliced(self,T):
+		k = [rng.getrandbits(T) for i in range(self.n-1)]
+		k.append(reduce(xor, k, 0))
 		return k
 
 	
@@ -278,12 +442,13 @@ class TwoTP(OTP):
 		self.n = n
 
 	def gen(self):
-		k = []
-		for i in range(int(self.n/2)):
-			k.append(secrets.choice([0,1]))
-		k = k + k
+		k = Key((rng.choice([0,1]) for i in range(int(self.n/2))), reps=2)   # second half is a view of the first
 		return k
 
+	def gen_sliced(self,T):
+		k = [rng.getrandbits(T) for i in range(int(self.n/2))]
+		return k + k
+
 	
 ################################################################################
 ## Quasi-OTP
@@ -297,14 +462,34 @@ class QuasiOTP(OTP):
 	def gen(self):
 		found = False
 		while not found:
-			k = []
-			for i in range(self.n):
-				k.append(secrets.choice([0,1]))
-			for bi in k:
-				if bi==1:
-					found=True
+			k = Key(rng.choice([0,1]) for i in range(self.n))
+			found = any(k.data)
 		return k
 
+	def gen_sliced(self,T):
+		mask = (1 << T) - 1
+		k = [rng.getrandbits(T) for i in range(self.n)]
+		z = ~reduce(or_, k, 0) & mask          # lanes with the all-zero key
+		while z:
+			# resample the all-zero lanes only
+			k = [ki | (rng.getrandbits(T) & z) for ki in k]
+			z = ~reduce(or_, k, 0) & mask
+		return k
+
+
+################################################################################
+## Known-plaintext key search
+################################################################################
+
+SEARCH_LIMIT = 100       # keys listed by -search
+
+def search_keys(P,x,y,limit=None):
+	# the keys k with P.enc(x,k) == y (the first limit ones, if given), with
+	# their probability under P.gen; the candidates are filtered per key
+	# position from the encryptions of x under every shift, rather than by
+	# enumerating the key space
+	return [(k,P.prob(k)) for k in islice(P.consistent_keys(x,y), limit)]
+
 
 ################################################################################
 ## Frontend
@@ -317,10 +502,12 @@ def print_usage():
     cipher scheme -enc keyfile x    encrypts plaintext x with key
     cipher scheme -dec keyfile y    decrypts ciphertext y with key
     cipher scheme -privk x0 x1      indistinguishability experiment on plaintexts x0,x1
+    cipher scheme -search x y [n]   finds all the keys (of length n) encrypting x into y
     
     where scheme in:
 	Uncipher
 	ShiftECB
+	Shift1Unbal
 	ShiftLazyOTP
 	Vigenere2Unbal
 	OTP
@@ -337,7 +524,14 @@ def get_n(args,op):
 		except ValueError:
 			print_usage()
 			sys.exit(0)
-	elif op in ["-enc","-dec","-privk"]:
+	elif op == "-search" and len(args) > 4:
+		try:
+			n = int(args[4])
+			return n
+		except ValueError:
+			print_usage()
+			sys.exit(0)
+	elif op in ["-enc","-dec","-privk","-search"]:
 		n = len(args[3])
 		return n
 	else:
@@ -358,6 +552,8 @@ def main(args):
 		P = Uncipher()
 	elif scheme == "ShiftECB":
 		P = ShiftECB()
+	elif scheme == "Shift1Unbal":
+		P = Shift1Unbal()
 	elif scheme == "ShiftLazyOTP":
 		n = get_n(args,op)
 		# print("n = " + str(n))
@@ -439,6 +635,30 @@ def main(args):
 			print_usage()
 			exit(0)
 
+	### Known-plaintext key search
+	elif op == "-search":
+		try:
+			x = args[2]
+			y = args[3]
+		except IndexError:
+			print_usage()
+			exit(0)
+		if not hasattr(P, "consistent_keys"):
+			print(scheme + ": key search not supported")
+			exit(0)
+		count = P.num_consistent_keys(x,y)
+		found = search_keys(P,x,y,SEARCH_LIMIT)
+		print(str(count) + " consistent keys (of " + str(P.key_space_size()) + ")")
+		if count <= SEARCH_LIMIT:
+			total = sum(p for (k,p) in found)
+			for (k,p) in found:
+				print("k = " + P.string_of_key(k) + "  prior = " + str(p) + "  posterior = " + str(p/total))
+		else:
+			# posteriors need the prior mass of all the consistent keys
+			for (k,p) in found:
+				print("k = " + P.string_of_key(k) + "  prior = " + str(p))
+			print("... (first " + str(SEARCH_LIMIT) + " keys only)")
+
 	else:
 		print("Unsupported operation " + op)
 		
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+# Crib dragging on TwoTP ciphertexts
+#
+# A TwoTP key repeats its first half, so the XOR of the two halves of a
+# ciphertext is the XOR of the two halves of the plaintext. If a crib
+# (a word guessed to occur in one half) is XORed at the right offset,
+# the corresponding fragment of the other half appears in clear.
+# Plaintexts are ASCII strings, 8 bits per char (most significant first).
+
+import os
+import sys
+import math
+import heapq
+
+# n-gram tables of the shift cipher cryptanalysis
+CRYPTANALYSIS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cryptanalysis")
+sys.path.insert(0, CRYPTANALYSIS)
+import ngrams
+
+ALPHABET = b'abcdefghijklmnopqrstuvwxyz '    # chars allowed in plaintexts
+
+# VALID_XOR[v] maps a byte b to 1 if b^v is in ALPHABET, to 0 otherwise:
+# translating a buffer with it XORs the whole buffer with v and checks
+# the result in a single pass
+VALID_XOR = [bytes(1 if (b ^ v) in ALPHABET else 0 for b in range(256)) for v in range(256)]
+
+QMIN = 6          # minimum average monogram quality of a fragment (0 to disable)
+
+def quality_tables(tables):
+	# Q_XOR[v] maps a byte b to the monogram quality (0..15) of the char b^v:
+	# 4 * (3 + log10 of its probability), 0 if not in ALPHABET. Spaces count
+	# as a frequent letter. Qualities of up to 17 chars add up within a byte
+	q = [0] * 256
+	for c in ALPHABET:
+		lp = -0.75 if c == ord(' ') else tables[0][c - ord('a')]
+		q[c] = max(0, min(15, round(4 * (3 + lp))))
+	return [bytes(q[b ^ v] for b in range(256)) for v in range(256)]
+
+def half_xors(ciphertexts):
+	# XOR of the two halves of each (bitstring) ciphertext, as bytes
+	n = len(ciphertexts[0])
+	assert (n % 16 == 0), "TwoTP halves must be a whole number of bytes"
+	h = n // 2
+	D = []
+	for y in ciphertexts:
+		assert (len(y) == n), "Ciphertexts must have the same length"
+		D.append((int(y[:h],2) ^ int(y[h:],2)).to_bytes(h // 8, 'big'))
+	return D
+
+def drag(D, cribs, Q_XOR):
+	# yields (ciphertext index, offset, crib, fragment) for every crib and
+	# offset where crib XOR D gives a fragment made of ALPHABET chars only,
+	# with average monogram quality at least QMIN.
+	# All the offsets of all the ciphertexts are checked at once: the
+	# buffer B concatenates the XORed halves, and for each crib char j the
+	# translated column B[j:] marks the offsets where char j is valid
+	# (one byte per offset), and gives their quality. Qualities are summed
+	# over the columns as big integers, one byte lane per offset
+	H = len(D[0])
+	B = b''.join(D)
+	for crib in cribs:
+		L = len(crib)
+		if L == 0 or L > H:
+			continue
+		m = len(B) - L + 1
+		acc = -1
+		qsum = 0
+		for j in range(L):
+			col = B[j:j+m]
+			acc = acc & int.from_bytes(col.translate(VALID_XOR[crib[j]]), 'big')
+			if j < 17:
+				qsum = qsum + int.from_bytes(col.translate(Q_XOR[crib[j]]), 'big')
+		threshold = bytes(1 if v >= QMIN * min(L, 17) else 0 for v in range(256))
+		acc = acc & int.from_bytes(qsum.to_bytes(m, 'big').translate(threshold), 'big')
+		hits = acc.to_bytes(m, 'big')
+		o = hits.find(1)
+		while o >= 0:
+			if o % H <= H - L:     # the crib does not straddle two ciphertexts
+				fragment = bytes(b ^ c for (b,c) in zip(B[o:o+L], crib))
+				yield (o // H, o % H, crib, fragment)
+			o = hits.find(1, o + 1)
+
+def score(fragment, tables):
+	# log-likelihood ratio (log10) of the words of fragment under the n-gram
+	# model against uniformly random letters, using trigrams (or the
+	# longest n-grams fitting in shorter words)
+	total = 0.0
+	for w in fragment.split():
+		n = min(len(w), len(tables))
+		for i in range(len(w) - n + 1):
+			total = total + tables[n-1][ngrams.index_of(w[i:i+n].decode())] + n * math.log10(26)
+	return total
+
+def crib_drag(ciphertexts, cribs, tables, top=20):
+	# the top candidate fragments, as (score, index, offset, crib, fragment)
+	D = half_xors(ciphertexts)
+	Q_XOR = quality_tables(tables)
+	found = ((score(f, tables), i, o, c, f) for (i, o, c, f) in drag(D, cribs, Q_XOR))
+	return heapq.nlargest(top, found)
+
+def main(args):
+	if len(args) not in [2, 3]:
+		print("""\
+    Usage:
+    cribdrag ciphertexts cribs [top]   drags the cribs (one per line) across the
+                                       TwoTP ciphertexts (one bitstring per line)
+    """)
+		sys.exit(0)
+
+	with open(args[0], 'r') as f:
+		ciphertexts = [s.strip() for s in f if s.strip()]
+	with open(args[1], 'r') as f:
+		cribs = [s.strip().encode() for s in f if s.strip()]
+	top = int(args[2]) if len(args) == 3 else 20
+	tables = ngrams.load_tables(os.path.join(CRYPTANALYSIS, "ngrams_en.bin"))
+
+	for (sc, i, o, c, f) in crib_drag(ciphertexts, cribs, tables, top):
+		print(str(round(sc, 3)) + "  ciphertext " + str(i) + " offset " + str(o) + "  " + c.decode() + " -> " + f.decode())
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
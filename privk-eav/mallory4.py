@@ -2,15 +2,23 @@
 Mallory4: adversary for OTPlastXor
 """
 
-def plaintexts():
-    return ("000","001")
+def plaintexts(n=3):
+    return ("0"*n, "0"*(n-1) + "1")
 
 def guess(y):
     n = 0
     for bi in y[:-1]:
         n = n ^ int(bi)
-    if n==int(y[2]):
+    if n==int(y[-1]):
         bm = 0
     else:
         bm = 1
     return bm
+
+# bit-sliced guess: y[i] packs bit i of many ciphertexts, one per lane
+def guess_sliced(y, mask):
+    n = 0
+    for bi in y[:-1]:
+        n = n ^ bi
+    bm = n ^ y[-1]     # 1 in the lanes where the parity differs from y[-1]
+    return bm
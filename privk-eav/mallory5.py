@@ -2,12 +2,18 @@
 Mallory5: adversary for TwoTP
 """
 
-def plaintexts():
-    return ("0000","0010")
+def plaintexts(n=4):
+    h = n//2
+    return ("0"*n, "0"*h + "1" + "0"*(h-1))
 
 def guess(y):
-    if y[0]==y[2]:
+    if y[0]==y[len(y)//2]:
         bm = 0
     else:
         bm = 1
     return bm
+
+# bit-sliced guess: y[i] packs bit i of many ciphertexts, one per lane
+def guess_sliced(y, mask):
+    bm = y[0] ^ y[len(y)//2]   # 1 in the lanes where y[0] != y[n/2]
+    return bm
@@ -2,8 +2,8 @@
 Mallory6: adversary for QuasiOTP
 """
 
-def plaintexts():
-    return ("0000","1111")
+def plaintexts(n=4):
+    return ("0"*n, "1"*n)
 
 def guess(y):
     allZ = True          # allZ=True iff all bits in ciphertext are 0
@@ -16,3 +16,11 @@ def guess(y):
     else:
         bm = 0
     return bm
+
+# bit-sliced guess: y[i] packs bit i of many ciphertexts, one per lane
+def guess_sliced(y, mask):
+    nz = 0             # 1 in the lanes where some bit of the ciphertext is 1
+    for yi in y:
+        nz = nz | yi
+    bm = ~nz & mask
+    return bm
@@ -2,11 +2,11 @@
 Mallory7: adversary for ShiftLazyOTP
 """
 
-def plaintexts():
-    return ("aaaaaa","aaaaab")
+def plaintexts(n=5):
+    return ("a"*(n+1), "a"*n + "b")
 
 def guess(y):
-    if y[5]=="a":
+    if y[-1]=="a":
         bm = 0
     else:
         bm = 1
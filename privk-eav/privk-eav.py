@@ -3,6 +3,7 @@
 import sys
 import logging
 from cipher import *
+import instrument
 
 # choose the adversary
 from mallory2 import *
@@ -28,28 +29,63 @@ P = Shift1Unbal()
 # Adv = mallory4
 # P = OTPlastXor(3)
 
-assert (len(sys.argv)==2 and int(sys.argv[1])>0),"Usage: privk-eav n_experiments"
+(args, profile) = instrument.parse_flag(sys.argv[1:])
+assert (len(args) in [1,2] and int(args[0])>0 and args[1:] in [[],["-sliced"]]),"Usage: privk-eav n_experiments [-sliced] [-profile [time|cprofile|tracemalloc]]"
+
+if "-sliced" in args and not (hasattr(P, "exp_sliced") and "guess_sliced" in globals()):
+    print("Usage: privk-eav n_experiments [-sliced] [-profile [time|cprofile|tracemalloc]]")
+    print("-sliced needs a scheme with exp_sliced and an adversary with guess_sliced (OTP family)")
+    sys.exit(0)
 
 logging.basicConfig(format='%(message)s', filename='log', level=logging.INFO)
 
 S = 0                 # number of experiments where the adversary wins
-N = int(sys.argv[1])  # total number of experiments
+N = int(args[0])      # total number of experiments
+
+if profile:
+    instrument.start(profile)
+
+if "-sliced" in args:
+    # bit-sliced mode (OTP family): runs up to LANES experiments at once,
+    # one per bit of the integers packing keys, plaintexts and ciphertexts
+    LANES = 1 << 16
+    (x0,x1) = plaintexts()
+    done = 0
+    while done < N:
+        T = min(LANES, N - done)
+        mask = (1 << T) - 1
+        with instrument.phase("exp", T):
+            (b,y) = P.exp_sliced(x0,x1,T)
+        with instrument.phase("guess", T):
+            bm = guess_sliced(y,mask)
+        S = S + (~(bm ^ b) & mask).bit_count()    # lanes where bm==b
+        done = done + T
+        instrument.count("experiments", T)
+    logging.info("Bit-sliced experiments: " + str(N) + ", Mallory wins: " + str(S))
+    print("Percentage of success: " + str(S*100./N))
+    if profile:
+        instrument.dump(instrument.stop())
+    sys.exit(0)
 
 for i in range(N):
     logging.info("Experiment " + str(i+1))
 
     # M -> A : x0, x1
-    (x0,x1) = plaintexts()
+    with instrument.phase("plaintexts"):
+        (x0,x1) = plaintexts()
     logging.info("x0 = " + x0)
     logging.info("x1 = " + x1)
 
     # A -> M : y = Ek(x[b])
-    (b,y) = P.exp(x0,x1)
+    with instrument.phase("exp"):
+        (b,y) = P.exp(x0,x1)
     logging.info("b = " + str(b))   
     logging.info("y = " + y)
 
     # M : bm   
-    bm = guess(y)
+    with instrument.phase("guess"):
+        bm = guess(y)
+    instrument.count("experiments")
     logging.info("bm = " + str(bm))
     
     if bm==b:
@@ -59,3 +95,6 @@ for i in range(N):
         logging.info("PrivK = 0 (Mallory loses)")
 
 print("Percentage of success: " + str(S*100./N))
+
+if profile:
+    instrument.dump(instrument.stop())
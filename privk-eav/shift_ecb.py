@@ -2,22 +2,17 @@
 
 import sys
 import secrets
+import z26
 
-def int_of_chr(n):
-    return ord(n)-ord('a')
-
-def chr_of_int(n):
-    return chr(n + ord('a'))
-    
 def gen():
     k = secrets.randbelow(26)
     return k
 
 def enc(x,k):
-    return  ''.join(map(lambda n : chr_of_int((int_of_chr(n) + k)%26), x))
+    return z26.enc(x,k)
 
 def dec(y,k):
-    return  ''.join(map(lambda n : chr_of_int((int_of_chr(n) - k)%26), y))
+    return z26.dec(y,k)
 
 
 
@@ -2,13 +2,8 @@
 
 import sys
 import secrets
+import z26
 
-def int_of_chr(n):
-    return ord(n)-ord('a')
-
-def chr_of_int(n):
-    return chr(n + ord('a'))
-    
 def gen():
     a = secrets.choice([0,1])
     if a==0:
@@ -19,11 +14,11 @@ def gen():
 
 def enc(x,k):
     assert(len(x)==1),"Plaintext must have length 1"
-    return  ''.join(map(lambda n : chr_of_int((int_of_chr(n) + k)%26), x))
+    return z26.enc(x,k)
 
 def dec(y,k):
-    assert(len(x)==1),"Ciphertext must have length 1"    
-    return  ''.join(map(lambda n : chr_of_int((int_of_chr(n) - k)%26), y))
+    assert(len(y)==1),"Ciphertext must have length 1"
+    return z26.dec(y,k)
 
 
 
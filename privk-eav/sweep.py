@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+# Parameter sweeps of PrivK experiments
+#
+# A grid is a JSON list of entries such as
+#   {"scheme": "TwoTP", "n": [4, 8, 16], "adversary": "mallory5",
+#    "N": 100000, "seed": [0, 1]}
+# where every list-valued field is expanded (cartesian product), and n is
+# omitted (or null) for schemes without security parameter. Each point runs
+# N experiments of the scheme against the adversary, with the randomness of
+# cipher.py seeded by seed; results of seeded points are cached in
+# CACHE_FILE, so that re-running a sweep only computes the new points.
+# Points without a seed use the system CSPRNG: they are not reproducible,
+# so they are run again every time and never cached.
+
+import sys
+import json
+import importlib
+import itertools
+import multiprocessing
+import cipher
+
+CACHE_FILE = ".sweep_cache.json"
+LANES = 1 << 16          # experiments per bit-sliced batch
+
+def expand(grid):
+	# the points (scheme, n, adversary, N, seed) of a grid
+	points = []
+	for entry in grid:
+		fields = ["scheme", "n", "adversary", "N", "seed"]
+		values = [entry.get(f) for f in fields]
+		values = [v if isinstance(v, list) else [v] for v in values]
+		points.extend(itertools.product(*values))
+	return points
+
+def key_of_point(point):
+	return "|".join(map(str, point))
+
+def seeded(point):
+	# only seeded points are reproducible, hence cacheable
+	return point[4] is not None
+
+def cost(point):
+	# estimated running time of a point, to schedule the longest first
+	(scheme, n, adversary, N, seed) = point
+	return N * (n or 1)
+
+def run_point(point):
+	# number of experiments won by the adversary
+	(scheme, n, adversary, N, seed) = point
+	cipher.seed(seed)
+	P = getattr(cipher, scheme)(n) if n else getattr(cipher, scheme)()
+	A = importlib.import_module(adversary)
+	(x0,x1) = A.plaintexts(n) if n else A.plaintexts()
+	S = 0
+	if hasattr(P, "exp_sliced") and hasattr(A, "guess_sliced"):
+		# bit-sliced experiments
+		done = 0
+		while done < N:
+			T = min(LANES, N - done)
+			mask = (1 << T) - 1
+			(b,y) = P.exp_sliced(x0,x1,T)
+			S = S + (~(A.guess_sliced(y,mask) ^ b) & mask).bit_count()
+			done = done + T
+	else:
+		for i in range(N):
+			(b,y) = P.exp(x0,x1)
+			if A.guess(y) == b:
+				S = S + 1
+	return (point, S)
+
+def load_cache():
+	try:
+		with open(CACHE_FILE, 'r') as f:
+			return json.load(f)
+	except (OSError, ValueError):
+		return {}
+
+def save_cache(cache):
+	with open(CACHE_FILE, 'w') as f:
+		json.dump(cache, f, indent=0)
+
+def sweep(grid, workers=None):
+	# runs the points of grid that are not cached, longest first, on a
+	# worker pool; returns the list of (point, wins)
+	points = expand(grid)
+	cache = load_cache()
+	results = {key_of_point(p): cache[key_of_point(p)] for p in points
+	           if seeded(p) and key_of_point(p) in cache}
+	todo = sorted({p for p in points if key_of_point(p) not in results}, key=cost, reverse=True)
+	if todo:
+		with multiprocessing.Pool(workers) as pool:
+			for (point, S) in pool.imap_unordered(run_point, todo):
+				results[key_of_point(point)] = S
+				if seeded(point):
+					cache[key_of_point(point)] = S
+					save_cache(cache)          # keep finished points if interrupted
+	return [(p, results[key_of_point(p)]) for p in points]
+
+def print_table(results):
+	print(f"{'scheme':<16}{'n':>6}  {'adversary':<10}{'N':>10}{'seed':>6}{'wins':>10}{'success %':>11}")
+	for ((scheme, n, adversary, N, seed), S) in results:
+		n = "-" if n is None else n
+		seed = "-" if seed is None else seed
+		print(f"{scheme:<16}{n:>6}  {adversary:<10}{N:>10}{seed:>6}{S:>10}{S*100./N:>11.3f}")
+
+def main(args):
+	if len(args) not in [1, 2]:
+		print("""\
+    Usage:
+    sweep grid.json [workers]   runs the PrivK experiments of a grid (see sweep.py)
+    """)
+		sys.exit(0)
+
+	with open(args[0], 'r') as f:
+		grid = json.load(f)
+	workers = int(args[1]) if len(args) == 2 else None
+	print_table(sweep(grid, workers))
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
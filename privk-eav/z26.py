@@ -0,0 +1,53 @@
+# Shift encryption on the alphabet a..z (Z26), with precomputed tables
+#
+# ENC[k] and DEC[k] are the str.translate tables of the shift by k, so a
+# string is shifted in a single call; ENC_CHR[k][c] and DEC_CHR[k][c] are
+# the same 26x26 tables on single characters, for keys varying along the
+# string. Characters outside a..z are left unchanged by all the tables, so
+# every scheme passes them through.
+
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+
+def int_of_chr(n):
+	return ord(n)-ord('a')
+
+def chr_of_int(n):
+	return chr(n + ord('a'))
+
+def rotated(k):
+	return LETTERS[k:] + LETTERS[:k]
+
+class CharTable(dict):
+	# a shift on single characters, mapping the other characters to themselves
+	def __missing__(self, c):
+		return c
+
+ENC = [str.maketrans(LETTERS, rotated(k)) for k in range(26)]
+DEC = [str.maketrans(rotated(k), LETTERS) for k in range(26)]
+ENC_CHR = [CharTable(zip(LETTERS, rotated(k))) for k in range(26)]
+DEC_CHR = [CharTable(zip(rotated(k), LETTERS)) for k in range(26)]
+
+def enc(x,k):
+	# (x1+k)%26 (x2+k)%26 ... (xn+k)%26
+	return x.translate(ENC[k % 26])
+
+def dec(y,k):
+	return y.translate(DEC[k % 26])
+
+def enc_keys(x,k):
+	# (x1+k1)%26 (x2+k2)%26 ... (xn+kn)%26, for keys k1..kn in 0..25
+	return ''.join([ENC_CHR[ki][xi] for (xi,ki) in zip(x,k)])
+
+def dec_keys(y,k):
+	return ''.join([DEC_CHR[ki][yi] for (yi,ki) in zip(y,k)])
+
+def enc_many(xs,ks):
+	# encryptions of every message of xs with every shift of ks, as a 2-D
+	# list: row i holds the encryptions with ks[i]
+	return [[x.translate(ENC[k % 26]) for x in xs] for k in ks]
+
+def shift_keys(x,y):
+	# for each position i, the shifts k with enc(x[i],k) == y[i], read off
+	# the encryptions of x under all the 26 keys
+	rows = enc_many([x],range(26))
+	return [[k for k in range(26) if rows[k][0][i] == yi] for (i,yi) in enumerate(y)]